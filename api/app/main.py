@@ -1,26 +1,40 @@
-import json, os
+import asyncio, hashlib, json, os, uuid
+from datetime import datetime
 from typing import Optional
 
-import asyncio
 from .services.translate import translate_event_dict
 
-from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi import FastAPI, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from sqlalchemy import select, func, text
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from .db import engine, Base, SessionLocal
+from .db import SessionLocal
+from .migrations import ensure_schema
+from .partitions import estimated_rows
 from .models import Event, Source
-from .schemas import EventOut, EntityOut, TimelineItem, DraftOut, SourceOut
-from .services.generate import gen_why_now_and_draft
+from .schemas import EventOut, JobOut, RelatedEventOut
+from .services.cache import data_version, db_version, get_cached, set_cached
+from .services.entities import related_events
+from .services.export import EXPORT_FORMATS, ExportFilter, export_stream, parquet_available
+from .services.feed import (
+    CACHE_SCOPE, COMPACT_FIELDS, EventsQuery, InvalidCursor, dumps, event_dict, fetch_by_ids, pack_page,
+    render_events, unpack_page,
+)
+from .services.jobs import generation_queue
+from .services.offline import OFFLINE_MODE, get_snapshot
+from .services.stream import StreamFilter, broadcaster
+from .services.timeline import attach_timelines
 app = FastAPI(title="Fin News Hot")
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[os.getenv("ALLOWED_ORIGINS","*")],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 async def get_db():
@@ -29,58 +43,53 @@ async def get_db():
 
 @app.on_event("startup")
 async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        # Soft migrations for new AI-filter columns
-        await conn.execute(text("""
-        DO $$ BEGIN
-            IF NOT EXISTS (
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='events' AND column_name='event_type'
-            ) THEN
-                ALTER TABLE events ADD COLUMN event_type VARCHAR(64);
-            END IF;
-            IF NOT EXISTS (
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='events' AND column_name='materiality_ai'
-            ) THEN
-                ALTER TABLE events ADD COLUMN materiality_ai DOUBLE PRECISION;
-            END IF;
-            IF NOT EXISTS (
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='events' AND column_name='impact_side'
-            ) THEN
-                ALTER TABLE events ADD COLUMN impact_side VARCHAR(16);
-            END IF;
-            IF NOT EXISTS (
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='events' AND column_name='risk_flags'
-            ) THEN
-                ALTER TABLE events ADD COLUMN risk_flags JSONB DEFAULT '[]'::jsonb;
-            END IF;
-            IF NOT EXISTS (
-                SELECT 1 FROM information_schema.columns
-                WHERE table_name='events' AND column_name='ai_entities'
-            ) THEN
-                ALTER TABLE events ADD COLUMN ai_entities JSONB DEFAULT '[]'::jsonb;
-            END IF;
-        END $$;
-        """))
+    if OFFLINE_MODE:
+        # без Postgres: снапшот грузим сразу, а не на первом запросе
+        get_snapshot()
+        return
+    # create_all + soft migrations (columns/indexes for existing tables)
+    await ensure_schema()
+    await generation_queue.resume()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await broadcaster.close()
+    await generation_queue.close()
+
+EXACT_COUNT_BELOW = 100_000
+
+async def _row_count(db: AsyncSession, model) -> int:
+    # на большой истории count(*) обходит все партиции — берём оценку планировщика
+    estimate = await estimated_rows(db, model.__tablename__)
+    if estimate >= EXACT_COUNT_BELOW:
+        return estimate
+    return (await db.execute(select(func.count()).select_from(model))).scalar_one()
 
 @app.get("/health")
 async def health(db: AsyncSession = Depends(get_db)):
-    events = (await db.execute(select(func.count()).select_from(Event))).scalar_one()
-    sources = (await db.execute(select(func.count()).select_from(Source))).scalar_one()
+    events = await _row_count(db, Event)
+    sources = await _row_count(db, Source)
     last_source = (await db.execute(select(func.max(Source.first_seen)))).scalar_one()
     return {"ok": True, "events": events, "sources": sources, "last_source": last_source}
 
-@app.get("/events", response_model=list[EventOut])
-async def list_events(
+def _etag(version: str, *parts: str) -> str:
+    """Weak ETag: версия данных + параметры запроса."""
+    h = hashlib.sha1("|".join((version, *parts)).encode()).hexdigest()[:24]
+    return f'W/"{h}"'
+
+def _not_modified(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or tag.removeprefix("W/") in candidates
+
+def _events_query(
     q: Optional[str] = None,
     min_hotness: float = 0.0,
     confirmed: Optional[bool] = None,
     types: Optional[str] = Query(None),
-    order: str = "hotness",
+    order: Optional[str] = None,           # hotness|recent|relevance (по умолчанию relevance при q, иначе hotness)
     offset: int = 0,
     limit: int = 50,
     # AI-filter params
@@ -88,122 +97,220 @@ async def list_events(
     impact_side: Optional[str] = None,     # "pos" | "neg" | "uncertain"
     min_materiality_ai: float = 0.0,
     lang: Optional[str] = None,
+    cursor: Optional[str] = None,          # keyset-пагинация: значение X-Next-Cursor прошлой страницы
+    fields: Optional[str] = None,          # CSV полей EventOut, например "id,headline,hotness"
+    view: Optional[str] = None,            # "compact" — облегчённая карточка для списка
+    ticker: Optional[str] = None,          # события с тикером, например TSLA
+    entity: Optional[str] = None,          # события с сущностью (имя нормализуется: "Apple Inc." = "apple")
+    since: Optional[datetime] = None,      # first_seen >= since
+) -> EventsQuery:
+    try:
+        return EventsQuery.from_params(
+            q=q, min_hotness=min_hotness, confirmed=confirmed, types=types, order=order,
+            offset=offset, limit=limit, event_type=event_type, impact_side=impact_side,
+            min_materiality_ai=min_materiality_ai, lang=lang, cursor=cursor,
+            fields=fields, view=view, ticker=ticker, entity=entity, since=since,
+        )
+    except ValueError as ex:
+        raise HTTPException(400, str(ex))
+
+def _offline_events(request: Request, query: EventsQuery) -> Response:
+    snapshot = get_snapshot()
+    tag = _etag(snapshot.version, "offline", query.cache_key())
+    if _not_modified(request, tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+    try:
+        body, next_cursor = snapshot.render(query)
+    except InvalidCursor as ex:
+        raise HTTPException(400, str(ex))
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/events", response_model=list[EventOut])
+async def list_events(
+    request: Request,
+    query: EventsQuery = Depends(_events_query),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = select(Event).options(selectinload(Event.sources))
-    stmt = stmt.order_by(Event.hotness.desc() if order=="hotness" else Event.first_seen.desc())
-    if min_hotness > 0: stmt = stmt.where(Event.hotness >= min_hotness)
-    if confirmed is not None: stmt = stmt.where(Event.confirmed == confirmed)
-    if q: stmt = stmt.where(Event.headline.ilike(f"%{q}%"))
-    if types:
-        allowed = [t.strip() for t in types.split(",") if t.strip()]
-        if allowed:
-            subq = select(1).select_from(Source).where(Source.event_id == Event.id, Source.type.in_(allowed))
-            stmt = stmt.where(subq.exists())
-    if event_type:
-        stmt = stmt.where(Event.event_type == event_type)
-    if impact_side:
-        stmt = stmt.where(Event.impact_side == impact_side)
-    if min_materiality_ai > 0:
-        stmt = stmt.where((Event.materiality_ai.is_not(None)) & (Event.materiality_ai >= min_materiality_ai))
-    stmt = stmt.offset(offset).limit(limit)
-
-    res = await db.execute(stmt)
-    rows = res.scalars().unique().all()
-
-    out = [EventOut(
-        id=str(e.id), headline=e.headline, hotness=e.hotness,
-        why_now=e.why_now, confirmed=e.confirmed,
-        entities=[EntityOut(**x) for x in (e.entities or [])],
-        timeline=[TimelineItem(**x) for x in (e.timeline or [])],
-        draft=(DraftOut(**e.draft) if e.draft else None),
-        sources=[SourceOut(url=s.url, type=s.type, first_seen=s.first_seen) for s in (e.sources or [])],
-        event_type=e.event_type,
-        materiality_ai=e.materiality_ai,
-        impact_side=e.impact_side,
-        risk_flags=e.risk_flags or [],
-        ai_entities=[
-            EntityOut(
-                name=(x.get("name") or (x.get("ticker") or "")),
-                type=(x.get("type") or ("TICKER" if x.get("ticker") else "ORG")),
-                ticker=x.get("ticker"),
-                country=x.get("country"),
-                sector=x.get("sector"),
-            )
-            for x in (e.ai_entities or [])
-        ],
-    ) for e in rows]
-
-    if lang and lang.lower() != "en":
-        # переведём параллельно
-        translated = await asyncio.gather(*[translate_event_dict(o.model_dump(mode="json"), lang) for o in out])
-        return translated
-    return out
+    if OFFLINE_MODE:
+        return _offline_events(request, query)
+    key = query.cache_key()
+    version = await data_version()
+    if version is not None:
+        tag = _etag(f"v{version}", CACHE_SCOPE, key)
+    else:
+        tag = _etag(f"db{await db_version(db)}", CACHE_SCOPE, key)
+    # данные не менялись — 304 без основного запроса и сериализации
+    if _not_modified(request, tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+    # горячие страницы отдаём из Redis, не трогая Postgres
+    version, cached = await get_cached(CACHE_SCOPE, key, version)
+    if cached is not None:
+        body, next_cursor = unpack_page(cached)
+    else:
+        try:
+            body, next_cursor = await render_events(db, query)
+        except InvalidCursor as ex:
+            raise HTTPException(400, str(ex))
+        await set_cached(version, CACHE_SCOPE, key, pack_page(body, next_cursor))
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+SSE_KEEPALIVE_SECONDS = 15.0
+
+@app.get("/events/stream")
+async def stream_events(
+    request: Request,
+    min_hotness: float = 0.0,
+    types: Optional[str] = Query(None),
+    event_type: Optional[str] = None,
+    impact_side: Optional[str] = None,
+):
+    """SSE: `created` / `rescored` уведомления о событиях из ingest (Redis pub/sub)."""
+    flt = StreamFilter(
+        min_hotness=min_hotness,
+        types=frozenset(t.strip() for t in (types or "").split(",") if t.strip()),
+        event_type=event_type,
+        impact_side=impact_side,
+    )
+    sub = await broadcaster.subscribe(flt)
+    if sub is None:
+        raise HTTPException(503, "event stream requires REDIS_URL")
+
+    async def gen():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    notice = await asyncio.wait_for(sub.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                kind = "created" if notice.get("created") else "rescored"
+                yield f"event: {kind}\ndata: {json.dumps(notice, ensure_ascii=False)}\n\n"
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(gen(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/events/{event_id}", response_model=EventOut)
-async def get_event(event_id: str, lang: Optional[str] = None, db: AsyncSession = Depends(get_db)):
-    res = await db.execute(select(Event).options(selectinload(Event.sources)).where(Event.id == event_id))
+async def get_event(event_id: str, request: Request, lang: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    try:
+        eid = uuid.UUID(event_id)
+    except ValueError:
+        raise HTTPException(404, "event not found")
+    if OFFLINE_MODE:
+        body = get_snapshot().get(str(eid))
+        if body is None:
+            raise HTTPException(404, "event not found")
+        return Response(content=body, media_type="application/json")
+    # ETag по updated_at события: проба по первичному ключу вместо полной загрузки
+    updated = (await db.execute(select(Event.updated_at).where(Event.id == eid))).first()
+    if updated is None:
+        raise HTTPException(404, "event not found")
+    lang = None if not lang or lang.lower() == "en" else lang.lower()
+    tag = _etag(str(updated[0]), str(eid), lang or "")
+    if _not_modified(request, tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+    res = await db.execute(select(Event).options(selectinload(Event.sources)).where(Event.id == eid))
     e = res.scalars().first()
     if not e:
         raise HTTPException(404, "event not found")
-    out = EventOut(
-        id=str(e.id), headline=e.headline, hotness=e.hotness,
-        why_now=e.why_now, confirmed=e.confirmed,
-        entities=[EntityOut(**x) for x in (e.entities or [])],
-        timeline=[TimelineItem(**x) for x in (e.timeline or [])],
-        draft=(DraftOut(**e.draft) if e.draft else None),
-        sources=[SourceOut(url=s.url, type=s.type, first_seen=s.first_seen) for s in (e.sources or [])],
-        event_type=e.event_type,
-        materiality_ai=e.materiality_ai,
-        impact_side=e.impact_side,
-        risk_flags=e.risk_flags or [],
-        ai_entities=[
-            EntityOut(
-                name=(x.get("name") or (x.get("ticker") or "")),
-                type=(x.get("type") or ("TICKER" if x.get("ticker") else "ORG")),
-                ticker=x.get("ticker"),
-                country=x.get("country"),
-                sector=x.get("sector"),
-            )
-            for x in (e.ai_entities or [])
-        ],
-    )
-    if lang and lang.lower() != "en":
-        return await translate_event_dict(out.model_dump(mode="json"), lang)
-    return out
-
-@app.post("/events/{event_id}/generate", response_model=EventOut)
-async def generate_event(event_id: str, lang: Optional[str] = None, db: AsyncSession = Depends(get_db)):
-    res = await db.execute(
-        select(Event).options(selectinload(Event.sources)).where(Event.id == event_id)
+    await attach_timelines(db, [e])
+    out = event_dict(e)
+    if lang:
+        out = await translate_event_dict(out, lang)
+    return Response(content=dumps(out), media_type="application/json",
+                    headers={"ETag": tag, "Cache-Control": "no-cache"})
+
+@app.get("/events/{event_id}/related", response_model=list[RelatedEventOut])
+async def get_related(event_id: str, limit: int = Query(10, ge=1, le=50), db: AsyncSession = Depends(get_db)):
+    """Сюжетная нить: события с общими сущностями/тикерами, ближайшие по времени — выше."""
+    try:
+        eid = uuid.UUID(event_id)
+    except ValueError:
+        raise HTTPException(404, "event not found")
+    ranked = await related_events(db, eid, limit)
+    if ranked is None:
+        raise HTTPException(404, "event not found")
+    items = await fetch_by_ids(db, [oid for oid, _, _ in ranked], COMPACT_FIELDS)
+    extra = {str(oid): (score, names) for oid, score, names in ranked}
+    for item in items:
+        score, names = extra[item["id"]]
+        item["score"] = round(score, 4)
+        item["shared"] = names
+    return Response(content=dumps(items), media_type="application/json")
+
+def _job_out(job) -> JobOut:
+    return JobOut(
+        job_id=str(job.id), event_id=str(job.event_id), status=job.status,
+        error=job.error, created_at=job.created_at, updated_at=job.updated_at,
     )
-    e = res.scalars().first()
-    if not e:
+
+@app.post("/events/{event_id}/generate", response_model=JobOut, status_code=202)
+async def generate_event(event_id: str, response: Response, db: AsyncSession = Depends(get_db)):
+    """Ставит генерацию why_now + draft в фоновую очередь (повторный клик получает ту же задачу)."""
+    try:
+        eid = uuid.UUID(event_id)
+    except ValueError:
+        raise HTTPException(404, "event not found")
+    exists = (await db.execute(select(Event.id).where(Event.id == eid))).scalar_one_or_none()
+    if exists is None:
         raise HTTPException(404, "event not found")
+    job = await generation_queue.enqueue(eid)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return _job_out(job)
+
+@app.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str):
     try:
-        payload = gen_why_now_and_draft(
-            e.headline,
-            [{"url": s.url} for s in e.sources],
-            seed_text=e.why_now,  # <— добавили seed
-        )
-        e.why_now = payload.get("why_now")
-        e.draft = payload.get("draft")
-        await db.commit()
-    except Exception as ex:
-        # фолбэк, чтобы не падать на демо без ключа
-        e.why_now = e.why_now or "Важно сейчас: обновление от первоисточника/регулятора."
-        e.draft = e.draft or {
-            "title": e.headline,
-            "lede": "Кратко: ключевые детали и контекст будут уточняться.",
-            "bullets": ["Источник: см. ссылки ниже", "Подтверждение: есть", "Следим за обновлениями"],
-            "quote": "",
-            "attribution": [s.url for s in e.sources[:3]],
-        }
-        await db.commit()
-    return await get_event(event_id=event_id, lang=lang, db=db)
+        job = await generation_queue.get(uuid.UUID(job_id))
+    except ValueError:
+        job = None
+    if job is None:
+        raise HTTPException(404, "job not found")
+    return _job_out(job)
+
+@app.get("/export")
+async def export_events(
+    format: str = "ndjson",                # ndjson | parquet
+    since: Optional[datetime] = None,      # first_seen >= since
+    until: Optional[datetime] = None,      # first_seen < until
+    min_hotness: float = 0.0,
+    confirmed: Optional[bool] = None,
+    types: Optional[str] = Query(None),
+    event_type: Optional[str] = None,
+    impact_side: Optional[str] = None,
+    min_materiality_ai: float = 0.0,
+):
+    """Потоковая выгрузка истории: серверный курсор, память не растёт с объёмом."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"unknown format: {format}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(501, "parquet export requires pyarrow")
+    flt = ExportFilter(
+        since=since, until=until, min_hotness=min_hotness, confirmed=confirmed,
+        types=tuple(sorted({t.strip() for t in (types or "").split(",") if t.strip()})),
+        event_type=event_type, impact_side=impact_side, min_materiality_ai=min_materiality_ai,
+    )
+
+    async def gen():
+        # своя сессия: зависимость get_db закрывается до начала стриминга
+        async with SessionLocal() as db:
+            async for part in export_stream(db, flt, format):
+                yield part
+
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/x-ndjson"
+    ext = "parquet" if format == "parquet" else "ndjson"
+    return StreamingResponse(gen(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="events.{ext}"'})
 
 @app.get("/events_offline", response_model=list[EventOut])
-async def events_offline():
-    p = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "offline", "events.sample.json")
-    with open(os.path.normpath(p), "r", encoding="utf-8") as f:
-        return json.load(f)
\ No newline at end of file
+async def events_offline(request: Request, query: EventsQuery = Depends(_events_query)):
+    """/events поверх снапшота в памяти (offline/events.sample.json или OFFLINE_SNAPSHOT), без Postgres."""
+    return _offline_events(request, query)
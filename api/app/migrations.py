@@ -0,0 +1,106 @@
+"""Soft migrations shared by API startup and the workers.
+
+``create_all`` only creates missing tables, so columns and indexes added to
+existing tables are applied here idempotently.
+"""
+from sqlalchemy import text
+
+from .db import Base, engine
+from . import models  # noqa: F401  (registers tables on Base.metadata)
+from .models import SEARCH_TSV_SQL
+from .partitions import ensure_partitioning
+
+# Must exist before create_all builds indexes that depend on them.
+EXTENSIONS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+]
+
+SOFT_MIGRATIONS = [
+    # AI-filter columns
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='event_type')
+        THEN ALTER TABLE events ADD COLUMN event_type VARCHAR(64); END IF;
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='materiality_ai')
+        THEN ALTER TABLE events ADD COLUMN materiality_ai DOUBLE PRECISION; END IF;
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='impact_side')
+        THEN ALTER TABLE events ADD COLUMN impact_side VARCHAR(16); END IF;
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='risk_flags')
+        THEN ALTER TABLE events ADD COLUMN risk_flags JSONB DEFAULT '[]'::jsonb; END IF;
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='ai_entities')
+        THEN ALTER TABLE events ADD COLUMN ai_entities JSONB DEFAULT '[]'::jsonb; END IF;
+    END $$;
+    """,
+    # full-text search column (stored generated tsvector)
+    f"ALTER TABLE events ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS ({SEARCH_TSV_SQL}) STORED",
+    # denormalized source types, backfilled once from sources
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='source_types')
+        THEN
+            ALTER TABLE events ADD COLUMN source_types VARCHAR[] NOT NULL DEFAULT '{}';
+            UPDATE events e SET source_types = s.types
+            FROM (SELECT event_id, array_agg(DISTINCT type ORDER BY type) AS types FROM sources GROUP BY event_id) s
+            WHERE s.event_id = e.id;
+        END IF;
+    END $$;
+    """,
+    # keyset cursors and event_entities need first_seen; old rows could have NULL
+    """
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name='events' AND column_name='first_seen' AND is_nullable='YES')
+        THEN
+            UPDATE events SET first_seen = now() WHERE first_seen IS NULL;
+            ALTER TABLE events ALTER COLUMN first_seen SET NOT NULL;
+        END IF;
+    END $$;
+    """,
+    # change tracking for ETags (the index is created from the model)
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now()",
+    # ticker/type/score on the entity index (name rows get tickers on the next reindex-entities)
+    """
+    ALTER TABLE event_entities
+        ADD COLUMN IF NOT EXISTS ticker VARCHAR(16),
+        ADD COLUMN IF NOT EXISTS type VARCHAR(32),
+        ADD COLUMN IF NOT EXISTS score DOUBLE PRECISION
+    """,
+    "UPDATE event_entities SET ticker = substr(key, 3), type = 'TICKER' WHERE key LIKE 't:%' AND ticker IS NULL",
+    # one-time move of the legacy events.timeline JSONB into event_timeline; the table comment
+    # marks it done, so later startups do not rescan events while event_timeline is still empty
+    r"""
+    DO $$ BEGIN
+        IF obj_description('event_timeline'::regclass, 'pg_class') IS DISTINCT FROM 'backfilled from events.timeline' THEN
+            IF NOT EXISTS (SELECT 1 FROM event_timeline LIMIT 1) THEN
+                INSERT INTO event_timeline (event_id, t, what, what_hash)
+                SELECT e.id, (x->>'t')::timestamptz, x->>'what', md5(x->>'what')
+                FROM events e, jsonb_array_elements(coalesce(e.timeline, '[]'::jsonb)) x
+                WHERE jsonb_typeof(x) = 'object'
+                  AND x->>'what' IS NOT NULL
+                  AND x->>'t' ~ '^\d{4}-\d{2}-\d{2}'
+                ON CONFLICT (event_id, what_hash) DO NOTHING;
+            END IF;
+            COMMENT ON TABLE event_timeline IS 'backfilled from events.timeline';
+        END IF;
+    END $$;
+    """,
+]
+
+
+def _sync_indexes(sync_conn) -> None:
+    """Create indexes declared on the models that are missing on existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def ensure_schema() -> None:
+    async with engine.begin() as conn:
+        for stmt in EXTENSIONS:
+            await conn.execute(text(stmt))
+        await conn.run_sync(Base.metadata.create_all)
+        for stmt in SOFT_MIGRATIONS:
+            await conn.execute(text(stmt))
+        # opt-in (EVENTS_PARTITIONING): до индексов — они создаются уже на партиционированных таблицах
+        await ensure_partitioning(conn)
+        await conn.run_sync(_sync_indexes)
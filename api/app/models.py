@@ -1,11 +1,23 @@
 import datetime as dt, uuid
-from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Text, Integer, BigInteger, Index, Computed
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR, ARRAY
+from sqlalchemy.orm import relationship, deferred
 from .db import Base
 
 utcnow = lambda: dt.datetime.now(dt.timezone.utc)
 
+# Полнотекстовый индекс: headline (A) и why_now (B) в english+russian,
+# имена сущностей и тикеры — в 'simple' (без стемминга).
+SEARCH_TSV_SQL = (
+    "setweight(to_tsvector('english', coalesce(headline, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(headline, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(why_now, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(why_now, '')), 'B') || "
+    "setweight(to_tsvector('simple', "
+    "jsonb_path_query_array(coalesce(entities, '[]'::jsonb) || coalesce(ai_entities, '[]'::jsonb), '$[*].name')::text"
+    " || ' ' || jsonb_path_query_array(coalesce(ai_entities, '[]'::jsonb), '$[*].ticker')::text), 'A')"
+)
+
 class Event(Base):
     __tablename__ = "events"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -13,11 +25,12 @@ class Event(Base):
     hotness = Column(Float, nullable=False, default=0.0)
     why_now = Column(Text, nullable=True)
     entities = Column(JSONB, nullable=False, default=list)
-    timeline = Column(JSONB, nullable=False, default=list)
+    # legacy: история теперь в event_timeline; колонка осталась для старых строк (перенос — в migrations)
+    timeline = deferred(Column(JSONB, nullable=False, default=list))
     draft = Column(JSONB, nullable=True)
     confirmed = Column(Boolean, default=False)
     dedup_group = Column(String, index=True)
-    first_seen = Column(DateTime(timezone=True), default=utcnow)
+    first_seen = Column(DateTime(timezone=True), nullable=False, default=utcnow)
     sources = relationship("Source", back_populates="event", cascade="all, delete-orphan")
     event_type = Column(String(64), nullable=True,
                         index=True)  # guidance|M&A|sanctions|investigation|fine|delisting|dividend|buyback|regulatory|...
@@ -25,12 +38,114 @@ class Event(Base):
     impact_side = Column(String(16), nullable=True, index=True)  # pos|neg|uncertain
     risk_flags = Column(JSONB, nullable=False, default=list)  # ["single_source","old","repost",...]
     ai_entities = Column(JSONB, nullable=False, default=list)  # [{"name":"...","ticker":"..."}]
+    search_tsv = deferred(Column(TSVECTOR, Computed(SEARCH_TSV_SQL, persisted=True)))
+    # денормализованные типы источников (фильтр types без EXISTS по sources)
+    source_types = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True)
+    # последние записи event_timeline; заполняется services.timeline.attach_timelines, не колонка
+    recent_timeline = None
+
+# keyset-пагинация /events: ORDER BY (hotness|first_seen) DESC, id DESC
+Index("ix_events_hotness_id", Event.hotness.desc(), Event.id.desc())
+Index("ix_events_first_seen_id", Event.first_seen.desc(), Event.id.desc())
+# поиск q: FTS по search_tsv + pg_trgm для подстрок и опечаток в заголовке
+Index("ix_events_search_tsv", Event.search_tsv, postgresql_using="gin")
+Index("ix_events_headline_trgm", Event.headline, postgresql_using="gin",
+      postgresql_ops={"headline": "gin_trgm_ops"})
+# фильтры /events в сочетании с сортировкой по hotness/first_seen
+Index("ix_events_source_types", Event.source_types, postgresql_using="gin")
+Index("ix_events_event_type_hotness", Event.event_type, Event.hotness.desc(), Event.id.desc())
+Index("ix_events_event_type_first_seen", Event.event_type, Event.first_seen.desc(), Event.id.desc())
+Index("ix_events_impact_side_hotness", Event.impact_side, Event.hotness.desc(), Event.id.desc())
+Index("ix_events_confirmed_hotness", Event.hotness.desc(), Event.id.desc(),
+      postgresql_where=Event.confirmed.is_(True))
+Index("ix_events_materiality_hotness", Event.hotness.desc(), Event.id.desc(),
+      postgresql_where=Event.materiality_ai.is_not(None))
 
 class Source(Base):
     __tablename__ = "sources"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
     url = Column(String, nullable=False)
     type = Column(String, nullable=False, default="news")
     first_seen = Column(DateTime(timezone=True), default=utcnow)
     event = relationship("Event", back_populates="sources")
+
+class EventEntity(Base):
+    """Inverted index: normalized entity/ticker key → events mentioning it."""
+    __tablename__ = "event_entities"
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(256), primary_key=True)       # "n:<normalized name>" | "t:<TICKER>"
+    name = Column(String(256), nullable=False)        # display name as seen in the event
+    weight = Column(Float, nullable=False, default=1.0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)  # = events.first_seen (окно по времени без JOIN)
+    ticker = Column(String(16), nullable=True)        # normalized ticker (also on name rows when known)
+    type = Column(String(32), nullable=True)          # ORG|PER|LOC|TICKER|...
+    score = Column(Float, nullable=True)              # NER/LLM confidence as extracted
+
+# /events/{id}/related и entity=: все события по ключу в окне времени — range scan
+Index("ix_event_entities_key_first_seen", EventEntity.key, EventEntity.first_seen.desc())
+# /events?ticker=: "всё по TSLA за последние сутки"
+Index("ix_event_entities_ticker_first_seen", EventEntity.ticker, EventEntity.first_seen.desc(),
+      postgresql_where=EventEntity.ticker.is_not(None))
+
+class TimelineEntry(Base):
+    """One dated line of an event's story; appended as a single row per update."""
+    __tablename__ = "event_timeline"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    t = Column(DateTime(timezone=True), nullable=False)
+    what = Column(Text, nullable=False)
+    what_hash = Column(String(32), nullable=False)    # md5(what): дедуп уникальным индексом
+
+Index("uq_event_timeline_what", TimelineEntry.event_id, TimelineEntry.what_hash, unique=True)
+# последние N записей события — probe по (event_id, t DESC)
+Index("ix_event_timeline_event_t", TimelineEntry.event_id, TimelineEntry.t.desc())
+
+class FeedRegistry(Base):
+    """Resolved feed for a configured source URL (homepage → feed/discovered/harvest)."""
+    __tablename__ = "feed_registry"
+    url = Column(String, primary_key=True)            # URL as written in sources.yaml
+    resolved_url = Column(String, nullable=False)     # where entries were actually found
+    method = Column(String(16), nullable=False)       # feed|discovered|harvest
+    verified_at = Column(DateTime(timezone=True), default=utcnow)
+    failures = Column(Integer, nullable=False, default=0)
+
+class SocialCursor(Base):
+    """High-water mark per social query: last tweet id or last post timestamp (ISO)."""
+    __tablename__ = "social_cursors"
+    key = Column(String, primary_key=True)            # "<platform>:<query>"
+    platform = Column(String(32), nullable=False)
+    query = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow)
+
+class Translation(Base):
+    """Durable translation tier behind Redis: (sha1 of text, target language, model) → text."""
+    __tablename__ = "translations"
+    text_hash = Column(String(40), primary_key=True)
+    target = Column(String(16), primary_key=True)
+    model = Column(String(128), primary_key=True)
+    source_text = Column(Text, nullable=False)
+    translated = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+class GenerationJob(Base):
+    """Background why_now/draft generation; at most one queued/running job per event."""
+    __tablename__ = "generation_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    status = Column(String(16), nullable=False, default="queued")  # queued|running|done|failed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+# single-flight: второй клик по той же карточке получает уже существующую задачу
+Index("uq_generation_jobs_active", GenerationJob.event_id, unique=True,
+      postgresql_where=GenerationJob.status.in_(("queued", "running")))
+
+class DataVersion(Base):
+    """Single-row change counter (id=1), bumped with the Redis version: /events ETag without Redis."""
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,217 @@
+"""Monthly range partitioning of ``events`` / ``sources`` on ``first_seen`` (opt-in).
+
+With ``EVENTS_PARTITIONING=1`` the schema step converts both tables into
+``PARTITION BY RANGE (first_seen)`` parents (once, copying existing rows),
+keeps partitions for the coming ``EVENTS_PARTITION_MONTHS_AHEAD`` months and a
+default partition as a safety net. Postgres cannot reference a partitioned
+table by ``id`` alone, so the foreign keys to ``events`` are dropped on
+conversion and nothing cascades from ``events`` in the database any more.
+Only ``Event.sources`` has an ORM cascade; ``event_entities`` and
+``event_timeline`` rows are not ORM relationships of ``Event``, so
+``archive_partitions`` moves them explicitly.
+
+``archive_partitions`` is the retention step: partitions whose whole month is
+older than N days are detached and moved to the ``archive`` schema, or written
+to Parquet and dropped.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+PARTITIONING = os.getenv("EVENTS_PARTITIONING", "0").lower() in {"1", "true", "yes"}
+MONTHS_AHEAD = int(os.getenv("EVENTS_PARTITION_MONTHS_AHEAD", "2"))
+ARCHIVE_SCHEMA = "archive"
+
+PARTITIONED_TABLES = ("events", "sources")  # порядок важен: sources ссылается на events
+_PART_NAME = re.compile(r"^(?P<table>\w+)_p(?P<y>\d{4})_(?P<m>\d{2})$")
+
+
+def _month_start(t: dt.datetime) -> dt.datetime:
+    return dt.datetime(t.year, t.month, 1, tzinfo=dt.timezone.utc)
+
+
+def _next_month(t: dt.datetime) -> dt.datetime:
+    return dt.datetime(t.year + (t.month == 12), t.month % 12 + 1, 1, tzinfo=dt.timezone.utc)
+
+
+def partition_name(table: str, month: dt.datetime) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    return bool((await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+        {"t": table},
+    )).scalar())
+
+
+async def _plain_columns(conn: AsyncConnection, table: str) -> list[str]:
+    """Columns that can be copied (generated ones are recomputed by the new table)."""
+    return list((await conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :t AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    ), {"t": table})).scalars())
+
+
+async def ensure_month_partitions(conn: AsyncConnection, table: str,
+                                  start: dt.datetime, end: dt.datetime) -> None:
+    """Monthly partitions covering [start, end) plus the default partition."""
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_pdefault PARTITION OF {table} DEFAULT"))
+    month = _month_start(start)
+    while month < end:
+        nxt = _next_month(month)
+        name = partition_name(table, month)
+        exists = (await conn.execute(text("SELECT to_regclass(:n) IS NOT NULL"), {"n": name})).scalar()
+        if not exists:
+            # строки этого месяца уже в default — партицию не создать, пока их не перенесут
+            stuck = (await conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {table}_pdefault WHERE first_seen >= :lo AND first_seen < :hi)"
+            ), {"lo": month, "hi": nxt})).scalar()
+            if stuck:
+                print(f"[partitions][WARN] {table}_pdefault holds rows for {name}; skipped", flush=True)
+            else:
+                await conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+                ))
+        month = nxt
+
+
+async def _convert(conn: AsyncConnection, table: str, now: dt.datetime) -> None:
+    legacy = f"{table}_unpartitioned"
+    print(f"[partitions] converting {table} to monthly range partitions", flush=True)
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    await conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey"))
+    await conn.execute(text(f"UPDATE {legacy} SET first_seen = now() WHERE first_seen IS NULL"))
+    await conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE) "
+        f"PARTITION BY RANGE (first_seen)"
+    ))
+    await conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN first_seen SET NOT NULL"))
+    # ключ партиционирования обязан входить в первичный ключ
+    await conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, first_seen)"))
+    oldest = (await conn.execute(text(f"SELECT min(first_seen) FROM {legacy}"))).scalar() or now
+    await ensure_month_partitions(conn, table, oldest, _next_month(now))
+    cols = ", ".join(await _plain_columns(conn, legacy))
+    await conn.execute(text(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {legacy}"))
+    # CASCADE снимает внешние ключи sources/event_entities/event_timeline → events
+    await conn.execute(text(f"DROP TABLE {legacy} CASCADE"))
+
+
+async def ensure_partitioning(conn: AsyncConnection, now: Optional[dt.datetime] = None) -> None:
+    """Convert once, then keep partitions for the coming months. Indexes come from the models afterwards."""
+    if not PARTITIONING:
+        return
+    now = now or dt.datetime.now(dt.timezone.utc)
+    horizon = _month_start(now)
+    for _ in range(MONTHS_AHEAD + 1):
+        horizon = _next_month(horizon)
+    for table in PARTITIONED_TABLES:
+        if not await is_partitioned(conn, table):
+            await _convert(conn, table, now)
+        await ensure_month_partitions(conn, table, now, horizon)
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[tuple[str, dt.datetime, dt.datetime]]:
+    """(name, from, to) of the monthly partitions of ``table``, oldest first."""
+    names = (await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": table})).scalars()
+    out = []
+    for name in names:
+        m = _PART_NAME.match(name)
+        if m and m["table"] == table:
+            lo = dt.datetime(int(m["y"]), int(m["m"]), 1, tzinfo=dt.timezone.utc)
+            out.append((name, lo, _next_month(lo)))
+    return sorted(out, key=lambda p: p[1])
+
+
+async def _detach(conn: AsyncConnection, table: str, name: str, mode: str) -> None:
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    if mode == "table":
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    else:
+        await conn.execute(text(f"DROP TABLE {name}"))
+
+
+async def _move_rows(conn: AsyncConnection, table: str, where: str, params: dict, mode: str) -> None:
+    """
+    Take rows of archived events out of a live table. mode="table": move them into
+    ``archive.<table>_archive`` in the same transaction; mode="parquet": delete
+    (they are already in the exported file).
+    """
+    if mode != "table":
+        await conn.execute(text(f"DELETE FROM {table} WHERE {where}"), params)
+        return
+    target = f"{ARCHIVE_SCHEMA}.{table}_archive"
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {target} (LIKE {table})"))
+    cols = ", ".join(await _plain_columns(conn, table))
+    await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table} WHERE {where} RETURNING {cols}) "
+        f"INSERT INTO {target} ({cols}) SELECT {cols} FROM moved"
+    ), params)
+
+
+async def archive_partitions(conn: AsyncConnection, older_than_days: float, mode: str = "table",
+                             parquet_dir: Optional[Path] = None,
+                             now: Optional[dt.datetime] = None) -> list[str]:
+    """
+    Move whole months older than ``older_than_days`` out of the hot tables.
+    mode="table": detach into ``archive.<partition>``; rows of the archived events in
+    event_timeline, event_entities and newer sources partitions go to
+    ``archive.<table>_archive``. mode="parquet": export to ``parquet_dir/<partition>.parquet``
+    (full timeline included) first, then drop and delete those rows. Returns archived
+    partition names.
+    """
+    if not await is_partitioned(conn, "events"):
+        raise RuntimeError("events is not partitioned (set EVENTS_PARTITIONING=1)")
+    now = now or dt.datetime.now(dt.timezone.utc)
+    cutoff = now - dt.timedelta(days=older_than_days)
+    old_events = [p for p in await list_partitions(conn, "events") if p[2] <= cutoff]
+    old_sources = [p for p in await list_partitions(conn, "sources") if p[2] <= cutoff]
+    if mode == "parquet":
+        # выгружаем всё до первого DETACH: он берёт эксклюзивную блокировку на events
+        for name, lo, hi in old_events:
+            await _export_month(parquet_dir or Path("."), name, lo, hi)
+    for name, lo, hi in old_events:
+        await _move_rows(conn, "event_timeline", f"event_id IN (SELECT id FROM {name})", {}, mode)
+        await _move_rows(conn, "event_entities", "first_seen >= :lo AND first_seen < :hi", {"lo": lo, "hi": hi}, mode)
+        # источники архивных событий, попавшие в более свежие месяцы
+        await _move_rows(conn, "sources", f"event_id IN (SELECT id FROM {name}) AND first_seen >= :hi",
+                         {"hi": hi}, mode)
+        await _detach(conn, "events", name, mode)
+    for name, _, _ in old_sources:
+        await _detach(conn, "sources", name, mode)
+    return [name for name, _, _ in old_events + old_sources]
+
+
+async def _export_month(parquet_dir: Path, name: str, lo: dt.datetime, hi: dt.datetime) -> None:
+    # отдельная сессия: выгрузка читает через ORM, а DDL идёт в транзакции conn
+    from .workers.export import export
+    from .services.export import ExportFilter
+
+    parquet_dir.mkdir(parents=True, exist_ok=True)
+    path = parquet_dir / f"{name}.parquet"
+    # вся хроника, а не последние TIMELINE_API_LIMIT записей: после DROP других копий нет
+    size = await export(path, "parquet", ExportFilter(since=lo, until=hi, timeline_limit=None))
+    print(f"[partitions] {name} -> {path} ({size} bytes)", flush=True)
+
+
+async def estimated_rows(conn, table: str) -> int:
+    """Planner estimate summed over partitions: /health без полного count(*)."""
+    return int((await conn.execute(text(
+        "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+        "WHERE c.oid = to_regclass(:t) "
+        "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:t))"
+    ), {"t": table})).scalar())
@@ -11,6 +11,7 @@ class EntityOut(BaseModel):
     name: str
     type: str
     ticker: Optional[str] = None
+    exchange: Optional[str] = None
     country: Optional[str] = None
     sector: Optional[str] = None
     source: Optional[str] = None
@@ -42,3 +43,27 @@ class EventOut(BaseModel):
     impact_side: Optional[str] = None
     risk_flags: list[str] = []
     ai_entities: List[EntityOut] = []
+
+class EventCompactOut(BaseModel):
+    """Slim card for list views (`view=compact`): no JSONB blobs, no sources."""
+    id: str
+    headline: str
+    hotness: float
+    why_now: Optional[str] = None
+    confirmed: bool
+    event_type: Optional[str] = None
+    materiality_ai: Optional[float] = None
+    impact_side: Optional[str] = None
+
+class RelatedEventOut(EventCompactOut):
+    """Neighbour in a story thread: weighted entity overlap × recency, and the shared entities."""
+    score: float
+    shared: list[str] = []
+
+class JobOut(BaseModel):
+    job_id: str
+    event_id: str
+    status: Literal["queued","running","done","failed"]
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
@@ -1,40 +1,52 @@
 import os, re, json, asyncio
 import httpx, certifi
 
+from .keywords import KeywordMatcher
+from .tickers import resolve_tickers
+
 # ===== эвристики на случай отсутствия ключа / проблем сети =====
+# порядок групп — приоритет типа, если в тексте слова нескольких групп
 KW_EVENT = [
-    (r"\b(merger|acquisition|acquire|merge|takeover|buyout|combination)\b", "M&A"),
-    (r"\b(dividend|buyback|repurchase)\b", "dividend/buyback"),
-    (r"\b(sanction|embargo)\b", "sanctions"),
-    (r"\b(investigation|probe|enforcement|charge|charged|settlement)\b", "investigation"),
-    (r"\b(fine|penalty)\b", "fine"),
-    (r"\b(delisting|delist|suspension)\b", "delisting"),
-    (r"\b(guidance|outlook|forecast)\b", "guidance"),
-    (r"\b(approval|rule|ruling|order|directive)\b", "regulatory"),
+    (("merger", "acquisition", "acquire", "merge", "takeover", "buyout", "combination"), "M&A"),
+    (("dividend", "buyback", "repurchase"), "dividend/buyback"),
+    (("sanction", "embargo"), "sanctions"),
+    (("investigation", "probe", "enforcement", "charge", "charged", "settlement"), "investigation"),
+    (("fine", "penalty"), "fine"),
+    (("delisting", "delist", "suspension"), "delisting"),
+    (("guidance", "outlook", "forecast"), "guidance"),
+    (("approval", "rule", "ruling", "order", "directive"), "regulatory"),
+]
+KW_IMPACT = [
+    (("upgrade", "approval", "record", "beat", "exceed"), "pos"),
+    (("downgrade", "fine", "penalty", "charge", "sanction", "delisting", "miss", "probe"), "neg"),
 ]
 
-def _heur_event_type(text: str) -> str:
-    t = (text or "").lower()
-    for pat, tag in KW_EVENT:
-        if re.search(pat, t): return tag
-    return "other"
+_EVENT_WORDS = KeywordMatcher([(w, tag) for words, tag in KW_EVENT for w in words], mode="word")
+_IMPACT_WORDS = KeywordMatcher([(w, side) for words, side in KW_IMPACT for w in words], mode="substring")
 
-def _heur_materiality(text: str) -> float:
+def _heur_event_type(hits: set[str]) -> str:
+    return _EVENT_WORDS.first(hits, "other")
+
+def _heur_materiality(text: str, hits: set[str]) -> float:
+    # первые две ступени — по группам KW_EVENT (целые слова), остальные — подстрокой, как раньше
     t = (text or "").lower()
-    if any(k in t for k,_ in KW_EVENT[:1]): return 0.85
-    if any(k in t for k,_ in KW_EVENT[1:3]): return 0.75
+    tags = {_EVENT_WORDS.value(k) for k in hits}
+    if "M&A" in tags: return 0.85
+    if tags & {"dividend/buyback", "sanctions"}: return 0.75
     if "investigation" in t or "enforcement" in t: return 0.7
     if "guidance" in t or "forecast" in t: return 0.6
     return 0.4
 
 def _heur_impact(text: str) -> str:
-    t = (text or "").lower()
-    if any(k in t for k in ["upgrade","approval","record","beat","exceed"]): return "pos"
-    if any(k in t for k in ["downgrade","fine","penalty","charge","sanction","delisting","miss","probe"]): return "neg"
-    return "uncertain"
+    # pos-слова стоят в таблице раньше: при смешанном тексте — "pos", как и раньше
+    return _IMPACT_WORDS.first(_IMPACT_WORDS.hits(text), "uncertain")
 
 def _extract_tickers(text: str) -> list[dict]:
-    # очень простая эвристика — до интеграции нормального тикер-маппера
+    # справочник тикеров (configs/symbols.csv): только известные эмитенты, с биржей и страной
+    known = resolve_tickers(text)
+    if known is not None:
+        return known
+    # без справочника — прежняя эвристика по заглавным словам
     tick = re.findall(r"\b[A-Z]{1,5}\b", text or "")
     ban = {"CEO","CFO","SEC","FOMC","FRB","EC","ECB","FCA","ESMA","EU","US","UK","USD","JPM"}
     uniq = []
@@ -81,7 +93,9 @@ Links:
 """
 
     try:
-        resp = client.chat.completions.create(
+        # синхронный клиент — в потоке: не блокируем цикл событий ingest/social
+        resp = await asyncio.to_thread(
+            client.chat.completions.create,
             model=model,
             messages=[{"role":"user","content":prompt}],
             temperature=0.1,
@@ -117,9 +131,10 @@ async def classify_event(headline: str, teaser: str, urls: list[str]) -> dict:
 
     # 2) эвристика (фолбэк)
     base_text = f"{headline}. {teaser or ''}"
+    hits = _EVENT_WORDS.hits(base_text)  # один проход на тип и материальность
     return {
-        "event_type": _heur_event_type(base_text),
-        "materiality_ai": _heur_materiality(base_text),
+        "event_type": _heur_event_type(hits),
+        "materiality_ai": _heur_materiality(base_text, hits),
         "impact_side": _heur_impact(base_text),
         "entities": _extract_tickers(base_text),
         "risk_flags": _risk_flags_from_context(teaser, urls),
@@ -0,0 +1,107 @@
+"""Redis-backed response cache for event lists.
+
+Entries are keyed by the data version and the normalized query, so a single
+``INCR`` of the version counter (done by ingest after it commits) invalidates
+every cached page at once; stale entries simply expire by TTL. The same bump
+also increments the one-row ``data_version`` table, which the API reads for
+ETags when Redis is not configured.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Optional
+
+import redis.asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import SessionLocal
+from ..models import DataVersion
+
+VERSION_KEY = "events:version"
+CACHE_TTL = int(os.getenv("EVENTS_CACHE_TTL", "300"))
+
+_redis = None
+
+
+async def get_redis():
+    """Shared async Redis client or None when REDIS_URL is not configured."""
+    global _redis
+    if _redis is not None:
+        return _redis
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    _redis = aioredis.from_url(url, decode_responses=True)
+    return _redis
+
+
+async def data_version() -> Optional[int]:
+    r = await get_redis()
+    if r is None:
+        return None
+    try:
+        return int(await r.get(VERSION_KEY) or 0)
+    except Exception:
+        return None
+
+
+async def db_version(session: AsyncSession) -> int:
+    """Change counter in Postgres (one row, read by primary key)."""
+    return (await session.execute(select(DataVersion.version).where(DataVersion.id == 1))).scalar_one_or_none() or 0
+
+
+async def _bump_db_version() -> None:
+    stmt = pg_insert(DataVersion).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[DataVersion.id], set_={"version": DataVersion.version + 1})
+    try:
+        async with SessionLocal() as session:
+            async with session.begin():
+                await session.execute(stmt)
+    except Exception as e:
+        print(f"[cache][WARN] data_version bump failed: {e!r}", flush=True)
+
+
+async def bump_version() -> Optional[int]:
+    """Called by writers after commit: invalidates all cached pages."""
+    # счётчик в БД двигаем всегда: API без Redis (или после его падения) строит ETag по нему
+    await _bump_db_version()
+    r = await get_redis()
+    if r is None:
+        return None
+    try:
+        return int(await r.incr(VERSION_KEY))
+    except Exception:
+        return None
+
+
+def _key(version: int, scope: str, query_key: str) -> str:
+    h = hashlib.sha1(query_key.encode()).hexdigest()
+    return f"cache:{scope}:v{version}:{h}"
+
+
+async def get_cached(scope: str, query_key: str, version: Optional[int] = None) -> tuple[Optional[int], Optional[str]]:
+    """Returns (version, body); version is None when caching is unavailable."""
+    r = await get_redis()
+    if r is None:
+        return None, None
+    try:
+        if version is None:
+            version = int(await r.get(VERSION_KEY) or 0)
+        return version, await r.get(_key(version, scope, query_key))
+    except Exception:
+        return None, None
+
+
+async def set_cached(version: Optional[int], scope: str, query_key: str, body: str) -> None:
+    if version is None:
+        return
+    r = await get_redis()
+    if r is None:
+        return
+    try:
+        await r.setex(_key(version, scope, query_key), CACHE_TTL, body)
+    except Exception:
+        pass
@@ -0,0 +1,153 @@
+"""Shared store of extracted article content, keyed by URL hash.
+
+``ingest.teaser_for`` and ``generate._fetch_context`` both need the text of the
+same article pages. Each page is downloaded and run through trafilatura once;
+the result (main text, meta description, fetch time) is kept as a
+zlib-compressed JSON file under ``CONTENT_CACHE_DIR`` and reused while fresh
+(``CONTENT_CACHE_TTL``). Failed fetches are remembered for a short
+``CONTENT_NEGATIVE_TTL`` so a dead link is not retried on every item. The
+directory is a shared volume, so the API and the ingest worker see each
+other's entries.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import certifi
+import httpx
+import orjson
+
+try:  # optional dependency: без него — meta description и текст без разметки
+    from trafilatura import extract as trafi_extract
+except Exception:  # pragma: no cover - executed when trafilatura is missing
+    trafi_extract = None
+
+CONTENT_CACHE_DIR = os.getenv("CONTENT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "finnews-content")
+CONTENT_CACHE_TTL = float(os.getenv("CONTENT_CACHE_TTL", str(3 * 86400)))
+CONTENT_NEGATIVE_TTL = float(os.getenv("CONTENT_NEGATIVE_TTL", "900"))
+MAX_TEXT_CHARS = 20000  # хватает и на тизер, и на контекст черновика
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; FinNewsHot/0.1; +http://localhost)",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+_SCRIPTS = re.compile(r"(?is)<script.*?</script>|<style.*?</style>")
+_TAGS = re.compile(r"(?is)<[^>]+>")
+_META_DESC = re.compile(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\']([^"\']+)["\']')
+_OG_DESC = re.compile(r'(?is)<meta[^>]+property=["\']og:description["\'][^>]+content=["\']([^"\']+)["\']')
+
+
+def strip_html(html: Optional[str]) -> str:
+    """Visible text of an HTML fragment with whitespace collapsed."""
+    text = _TAGS.sub(" ", _SCRIPTS.sub(" ", html or ""))
+    return " ".join(text.split())
+
+
+def meta_desc(html: Optional[str]) -> str:
+    """``<meta name=description>`` or ``og:description``, whitespace collapsed."""
+    m = _META_DESC.search(html or "") or _OG_DESC.search(html or "")
+    return " ".join(m.group(1).split()) if m else ""
+
+
+@dataclass(frozen=True)
+class Article:
+    url: str
+    text: str             # основной текст trafilatura или, если её нет, текст страницы без разметки
+    meta: str             # meta / og description
+    fetched_at: float     # unix time
+    extracted: bool = False  # text получен trafilatura
+    ok: bool = True       # False — страница не скачалась (негативная запись)
+
+    @property
+    def best(self) -> str:
+        """Text in the order the callers always preferred: extracted article, meta description, raw page text."""
+        return (self.text if self.extracted else "") or self.meta or self.text
+
+
+def _path(url: str) -> str:
+    h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(CONTENT_CACHE_DIR, h[:2], f"{h}.json.z")
+
+
+def _read(url: str) -> Optional[Article]:
+    try:
+        with open(_path(url), "rb") as f:
+            data = orjson.loads(zlib.decompress(f.read()))
+        art = Article(**data)
+    except (OSError, zlib.error, orjson.JSONDecodeError, TypeError):
+        return None
+    # коллизия sha1 практически невозможна, но запись чужого URL не отдаём
+    return art if art.url == url else None
+
+
+def _write(art: Article) -> None:
+    path = _path(art.url)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(zlib.compress(orjson.dumps(asdict(art)), 6))
+        # атомарная замена: другой процесс не прочитает недописанный файл
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[content][ERR write] {art.url}: {e}", flush=True)
+
+
+def _fresh(art: Article, now: float) -> bool:
+    ttl = CONTENT_CACHE_TTL if art.ok else CONTENT_NEGATIVE_TTL
+    return now - art.fetched_at < ttl
+
+
+def _extract(url: str, body: bytes, html: str, now: float) -> Article:
+    main = (trafi_extract(body) if trafi_extract else "") or ""
+    text = " ".join(main.split()) if main else strip_html(html)
+    return Article(url=url, text=text[:MAX_TEXT_CHARS], meta=meta_desc(html)[:1000],
+                   fetched_at=now, extracted=bool(main))
+
+
+def fetch_article(url: str, client: Optional[httpx.Client] = None) -> Optional[Article]:
+    """Article content from the store, downloading and extracting it only when missing or stale."""
+    if not url:
+        return None
+    now = time.time()
+    cached = _read(url)
+    if cached is not None and _fresh(cached, now):
+        return cached if cached.ok else None
+    try:
+        if client is None:
+            with httpx.Client(follow_redirects=True, timeout=20.0, verify=certifi.where(), headers=HEADERS) as c:
+                r = c.get(url)
+        else:
+            r = client.get(url)
+        r.raise_for_status()
+        art = _extract(url, r.content, r.text, now)
+    except Exception as e:
+        print(f"[content][WARN] {url}: {e!r}", flush=True)
+        _write(Article(url=url, text="", meta="", fetched_at=now, ok=False))
+        return None
+    _write(art)
+    return art
+
+
+def prune(max_age: Optional[float] = None) -> int:
+    """Delete entries older than ``max_age`` seconds (default: the TTL); returns how many were removed."""
+    cutoff = time.time() - (CONTENT_CACHE_TTL if max_age is None else max_age)
+    removed = 0
+    for root, _, files in os.walk(CONTENT_CACHE_DIR):
+        for name in files:
+            p = os.path.join(root, name)
+            try:
+                if os.path.getmtime(p) < cutoff:
+                    os.remove(p)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,277 @@
+"""Entity normalization and the event_entities inverted index.
+
+Every event's ``entities`` / ``ai_entities`` are flattened into rows keyed by a
+normalized name (``n:federal reserve``) or ticker (``t:TSLA``), with the ticker,
+type and score alongside. The rows are written at upsert time, so "other events
+about X" and "events mentioning TSLA" are range scans on ``(key, first_seen)`` /
+``(ticker, first_seen)`` instead of unpacking JSONB on every row.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import math
+import os
+import re
+import uuid
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, String, column, delete, func, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Event, EventEntity
+
+RELATED_WINDOW_DAYS = float(os.getenv("RELATED_WINDOW_DAYS", "30"))
+RELATED_HALF_LIFE_HOURS = float(os.getenv("RELATED_HALF_LIFE_HOURS", "72"))
+# потолок длины entities / ai_entities / risk_flags: строка и WAL не растут с возрастом сюжета
+MAX_ENTITIES = int(os.getenv("FINNEWS_MAX_ENTITIES", "24"))
+MAX_FLAGS = int(os.getenv("FINNEWS_MAX_FLAGS", "16"))
+
+TICKER_WEIGHT = 1.5  # тикер однозначнее имени
+AI_ENTITY_WEIGHT = 1.0
+DEFAULT_NER_WEIGHT = 0.5
+
+_SUFFIXES = {"inc", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "llc",
+             "lp", "sa", "ag", "nv", "se", "group", "holdings"}
+_PREFIXES = {"the", "пао", "оао", "ао", "ооо"}
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+_TICKER = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,11}$")
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """'The Apple, Inc.' → 'apple', 'ПАО Сбербанк' → 'сбербанк': регистр, пунктуация и юр. формы не важны."""
+    words = _NON_WORD.sub(" ", (name or "").casefold()).split()
+    while words and words[-1] in _SUFFIXES:
+        words.pop()
+    while words and words[0] in _PREFIXES:
+        words.pop(0)
+    return " ".join(words)
+
+
+def entity_key(name: Optional[str]) -> str:
+    """Index key for an ``entity=`` filter value."""
+    return f"n:{normalize_name(name)[:250]}"
+
+
+def normalize_ticker(ticker: Optional[str]) -> str:
+    t = (ticker or "").strip().lstrip("$").upper()
+    return t if _TICKER.match(t) else ""
+
+
+def _score(x: dict) -> Optional[float]:
+    try:
+        return None if x.get("score") is None else float(x["score"])
+    except (TypeError, ValueError):
+        return None
+
+
+def entity_keys(entities: Iterable[dict], ai_entities: Iterable[dict]) -> dict[str, dict]:
+    """key → {name, weight, ticker, type, score}; a repeated key keeps the highest weight."""
+    out: dict[str, dict] = {}
+
+    def put(key: str, weight: float, x: dict, ticker: str, etype: Optional[str]):
+        row = {
+            "name": (x.get("name") or ticker or key[2:])[:256],
+            "weight": weight,
+            "ticker": ticker or None,
+            "type": (etype or "")[:32] or None,
+            "score": _score(x),
+        }
+        other = out.get(key)
+        if other is not None:
+            if weight <= other["weight"]:
+                row, other = other, row
+            # недостающие тикер/тип/score берём из другого упоминания
+            for f in ("ticker", "type", "score"):
+                if row[f] is None:
+                    row[f] = other[f]
+        out[key] = row
+
+    for x, ai in [(x, False) for x in entities or []] + [(x, True) for x in ai_entities or []]:
+        norm = normalize_name(x.get("name"))
+        ticker = normalize_ticker(x.get("ticker"))
+        if len(norm) >= 2:
+            weight = AI_ENTITY_WEIGHT if ai else min(1.0, _score(x) or DEFAULT_NER_WEIGHT)
+            put(f"n:{norm[:250]}", weight, x, ticker, x.get("type"))
+        if ticker:
+            put(f"t:{ticker}", TICKER_WEIGHT, x, ticker, "TICKER")
+    return out
+
+
+def _merge_key(x: dict) -> Optional[str]:
+    ticker = normalize_ticker(x.get("ticker"))
+    if ticker:
+        return f"t:{ticker}"
+    norm = normalize_name(x.get("name"))
+    return f"n:{norm}" if norm else None
+
+
+def _rank(x: dict) -> tuple:
+    return (_score(x) or 0.0, bool(x.get("ticker")))
+
+
+def merge_entities(existing: Optional[list], incoming: Optional[list], limit: int = MAX_ENTITIES) -> list[dict]:
+    """
+    Union of two entity arrays deduplicated by ticker or normalized name and capped at
+    top-``limit`` by score. On a duplicate the higher-scored item wins and missing fields
+    are filled from the other; surviving items keep their original order.
+    """
+    merged: dict[str, dict] = {}
+    for x in list(existing or []) + list(incoming or []):
+        if not isinstance(x, dict):
+            continue
+        key = _merge_key(x)
+        if key is None:
+            continue
+        prev = merged.get(key)
+        if prev is None:
+            merged[key] = dict(x)
+            continue
+        winner, other = (dict(x), prev) if _rank(x) > _rank(prev) else (prev, x)
+        for k, v in other.items():
+            if winner.get(k) is None and v is not None:
+                winner[k] = v
+        merged[key] = winner
+    items = list(merged.values())
+    if len(items) > limit:
+        keep = sorted(range(len(items)), key=lambda i: _rank(items[i]), reverse=True)[:limit]
+        items = [items[i] for i in sorted(keep)]
+    return items
+
+
+def merge_flags(existing: Optional[list], incoming: Optional[list], limit: int = MAX_FLAGS) -> list[str]:
+    """Deduplicated flags in first-seen order, at most ``limit``."""
+    out: list[str] = []
+    for f in list(existing or []) + list(incoming or []):
+        if isinstance(f, str) and f and f not in out:
+            out.append(f)
+    return out[:limit]
+
+
+def entity_rows(event_id: uuid.UUID, first_seen: dt.datetime,
+                entities: Iterable[dict], ai_entities: Iterable[dict]) -> list[dict]:
+    """Rows of event_entities for one event (plain dicts for bulk insert)."""
+    return [
+        {"event_id": event_id, "key": key, "first_seen": first_seen, **values}
+        for key, values in entity_keys(entities, ai_entities).items()
+    ]
+
+
+async def sync_event_entities(session: AsyncSession, ev: Event) -> None:
+    """Bring the index rows of ``ev`` in line with its current entity arrays."""
+    rows = entity_rows(ev.id, ev.first_seen, ev.entities or [], ev.ai_entities or [])
+    keys = [r["key"] for r in rows]
+    stale = delete(EventEntity).where(EventEntity.event_id == ev.id)
+    if keys:
+        stale = stale.where(EventEntity.key.not_in(keys))
+    await session.execute(stale)
+    if rows:
+        stmt = pg_insert(EventEntity).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EventEntity.event_id, EventEntity.key],
+            set_={c: stmt.excluded[c] for c in ("name", "weight", "ticker", "type", "score")},
+        )
+        await session.execute(stmt)
+
+
+async def related_events(session: AsyncSession, event_id: uuid.UUID,
+                         limit: int = 10) -> Optional[list[tuple[uuid.UUID, float, list[str]]]]:
+    """
+    Neighbours of an event: (event_id, score, shared entity names), best first.
+    score = Σ min(w_self, w_other) · idf(key) по общим ключам × затухание по |Δ first_seen|;
+    idf гасит вездесущие сущности ("usa", "fed"). None — события нет.
+    Сумма и ранжирование — в SQL (GROUP BY event_id), LIMIT режет уже события, а не строки ключей.
+    """
+    first_seen = (await session.execute(select(Event.first_seen).where(Event.id == event_id))).scalar_one_or_none()
+    if first_seen is None:
+        return None
+    own = {k: (name, w) for k, name, w in (await session.execute(
+        select(EventEntity.key, EventEntity.name, EventEntity.weight).where(EventEntity.event_id == event_id)
+    )).all()}
+    if not own:
+        return []
+    window = dt.timedelta(days=RELATED_WINDOW_DAYS)
+    in_window = (EventEntity.key.in_(list(own)),
+                 EventEntity.first_seen >= first_seen - window,
+                 EventEntity.first_seen <= first_seen + window)
+    df = dict((await session.execute(
+        select(EventEntity.key, func.count()).where(*in_window).group_by(EventEntity.key)
+    )).all())
+    mine = values(column("key", String), column("w", Float), column("idf", Float), name="own").data(
+        [(k, w, 1.0 / math.log(2.0 + df.get(k, 1))) for k, (_, w) in own.items()]
+    )
+    part = func.least(EventEntity.weight, mine.c.w) * mine.c.idf
+    hours = func.abs(func.extract("epoch", func.max(EventEntity.first_seen) - first_seen)) / 3600.0
+    score = (func.sum(part) * func.power(0.5, hours / RELATED_HALF_LIFE_HOURS)).label("score")
+    rows = (await session.execute(
+        select(EventEntity.event_id, score, func.array_agg(aggregate_order_by(mine.c.key, part.desc())))
+        .join(mine, mine.c.key == EventEntity.key)
+        .where(*in_window, EventEntity.event_id != event_id)
+        .group_by(EventEntity.event_id)
+        .order_by(score.desc(), EventEntity.event_id)
+        .limit(limit)
+    )).all()
+    # n:- и t:-ключ одной сущности совпадают оба — имя в shared один раз
+    return [(oid, float(sc), list(dict.fromkeys(own[k][0] for k in keys))) for oid, sc, keys in rows]
+
+
+async def compact_events(session: AsyncSession, batch_size: int = 500) -> tuple[int, int]:
+    """
+    One-off cleanup of rows written before the arrays were bounded: dedup + top-K for
+    entities / ai_entities / risk_flags. Only changed rows are updated (and re-indexed).
+    Returns (scanned, compacted).
+    """
+    scanned = compacted = 0
+    last: Optional[tuple] = None
+    while True:
+        stmt = (select(Event.id, Event.first_seen, Event.entities, Event.ai_entities, Event.risk_flags)
+                .order_by(Event.first_seen, Event.id).limit(batch_size))
+        if last is not None:
+            stmt = stmt.where(tuple_(Event.first_seen, Event.id) > last)
+        batch = (await session.execute(stmt)).all()
+        if not batch:
+            return scanned, compacted
+        changes = []
+        for r in batch:
+            fixed = {
+                "entities": merge_entities(r.entities, []),
+                "ai_entities": merge_entities(r.ai_entities, []),
+                "risk_flags": merge_flags(r.risk_flags, []),
+            }
+            if fixed != {"entities": r.entities, "ai_entities": r.ai_entities, "risk_flags": r.risk_flags}:
+                changes.append((r, fixed))
+        if changes:
+            now = dt.datetime.now(dt.timezone.utc)
+            await session.execute(update(Event), [{"id": r.id, "updated_at": now, **fixed} for r, fixed in changes])
+            ids = [r.id for r, _ in changes]
+            rows = [row for r, fixed in changes
+                    for row in entity_rows(r.id, r.first_seen, fixed["entities"], fixed["ai_entities"])]
+            await session.execute(delete(EventEntity).where(EventEntity.event_id.in_(ids)))
+            if rows:
+                await session.execute(pg_insert(EventEntity), rows)
+        await session.commit()
+        scanned += len(batch)
+        compacted += len(changes)
+        last = (batch[-1].first_seen, batch[-1].id)
+
+
+async def reindex_entities(session: AsyncSession, batch_size: int = 500) -> int:
+    """Rebuild event_entities from the JSONB arrays of all events (backfill / repair)."""
+    done = 0
+    last: Optional[tuple] = None
+    while True:
+        stmt = (select(Event.id, Event.first_seen, Event.entities, Event.ai_entities)
+                .order_by(Event.first_seen, Event.id).limit(batch_size))
+        if last is not None:
+            stmt = stmt.where(tuple_(Event.first_seen, Event.id) > last)
+        batch = (await session.execute(stmt)).all()
+        if not batch:
+            return done
+        ids = [r.id for r in batch]
+        rows = [row for r in batch for row in entity_rows(r.id, r.first_seen, r.entities, r.ai_entities)]
+        await session.execute(delete(EventEntity).where(EventEntity.event_id.in_(ids)))
+        if rows:
+            await session.execute(pg_insert(EventEntity), rows)
+        await session.commit()
+        done += len(batch)
+        last = (batch[-1].first_seen, batch[-1].id)
@@ -0,0 +1,182 @@
+"""Streaming bulk export of events as NDJSON or Parquet.
+
+Rows come from a server-side cursor (``stream_scalars`` + ``yield_per``) and
+are written chunk by chunk, so memory stays flat regardless of how many
+events match. Used by ``GET /export`` and ``python -m app.workers.export``.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..models import Event
+from .feed import _iso, event_dict
+from .timeline import TIMELINE_API_LIMIT, attach_timelines
+
+try:  # optional dependency: only needed for format=parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - executed when pyarrow is missing
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Time range is half-open on first_seen: ``since <= first_seen < until``."""
+    since: Optional[dt.datetime] = None
+    until: Optional[dt.datetime] = None
+    min_hotness: float = 0.0
+    confirmed: Optional[bool] = None
+    types: tuple[str, ...] = ()
+    event_type: Optional[str] = None
+    impact_side: Optional[str] = None
+    min_materiality_ai: float = 0.0
+    timeline_limit: Optional[int] = TIMELINE_API_LIMIT  # None — вся хроника (архивная выгрузка)
+
+
+def build_export_stmt(flt: ExportFilter):
+    # порядок (first_seen, id) стабилен и идёт по ix_events_first_seen_id
+    stmt = select(Event).options(selectinload(Event.sources)).order_by(Event.first_seen, Event.id)
+    if flt.since: stmt = stmt.where(Event.first_seen >= flt.since)
+    if flt.until: stmt = stmt.where(Event.first_seen < flt.until)
+    if flt.min_hotness > 0: stmt = stmt.where(Event.hotness >= flt.min_hotness)
+    if flt.confirmed is not None: stmt = stmt.where(Event.confirmed.is_(flt.confirmed))
+    if flt.types: stmt = stmt.where(Event.source_types.overlap(list(flt.types)))
+    if flt.event_type: stmt = stmt.where(Event.event_type == flt.event_type)
+    if flt.impact_side: stmt = stmt.where(Event.impact_side == flt.impact_side)
+    if flt.min_materiality_ai > 0:
+        stmt = stmt.where((Event.materiality_ai.is_not(None)) & (Event.materiality_ai >= flt.min_materiality_ai))
+    return stmt
+
+
+def export_record(e: Event) -> dict:
+    """EventOut plus the event's own first_seen (the range key of the export)."""
+    out = event_dict(e)
+    out["first_seen"] = _iso(e.first_seen)
+    return out
+
+
+async def iter_chunks(db: AsyncSession, flt: ExportFilter,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[list[dict]]:
+    """Export records in chunks of at most ``chunk_size`` read through a server-side cursor."""
+    stmt = build_export_stmt(flt).execution_options(yield_per=chunk_size)
+    result = await db.stream_scalars(stmt)
+    try:
+        async for rows in result.partitions():
+            await attach_timelines(db, rows, flt.timeline_limit)
+            chunk = [export_record(e) for e in rows]
+            # отпускаем ORM-объекты прошлой пачки, чтобы identity map не рос
+            db.expunge_all()
+            yield chunk
+    finally:
+        await result.close()
+
+
+async def ndjson_stream(db: AsyncSession, flt: ExportFilter,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    async for chunk in iter_chunks(db, flt, chunk_size):
+        yield b"".join(orjson.dumps(r) + b"\n" for r in chunk)
+
+
+# Вложенные структуры (entities, sources, ...) кладём JSON-строками: схема плоская и стабильная.
+_NESTED = ("entities", "timeline", "draft", "sources", "ai_entities")
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("id", pa.string()),
+        ("first_seen", pa.timestamp("us", tz="UTC")),
+        ("headline", pa.string()),
+        ("hotness", pa.float64()),
+        ("why_now", pa.string()),
+        ("confirmed", pa.bool_()),
+        ("event_type", pa.string()),
+        ("materiality_ai", pa.float64()),
+        ("impact_side", pa.string()),
+        ("risk_flags", pa.list_(pa.string())),
+        ("source_types", pa.list_(pa.string())),
+        *((name, pa.string()) for name in _NESTED),
+    ])
+
+
+def _parquet_table(chunk: list[dict], schema):
+    cols = {name: [r.get(name) for r in chunk] for name in schema.names if name not in _NESTED}
+    cols["first_seen"] = [dt.datetime.fromisoformat(x.replace("Z", "+00:00")) if x else None
+                          for x in cols["first_seen"]]
+    cols["source_types"] = [sorted({s["type"] for s in r["sources"]}) for r in chunk]
+    for name in _NESTED:
+        cols[name] = [None if r[name] is None else orjson.dumps(r[name]).decode() for r in chunk]
+    return pa.Table.from_pydict(cols, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object: ParquetWriter writes into it, we drain it after each row group."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self._parts.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+async def parquet_stream(db: AsyncSession, flt: ExportFilter,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Parquet file as a byte stream: one row group per chunk, footer at the end."""
+    if not parquet_available():
+        raise RuntimeError("parquet export requires pyarrow")
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for chunk in iter_chunks(db, flt, chunk_size):
+            writer.write_table(_parquet_table(chunk, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(db: AsyncSession, flt: ExportFilter, fmt: str = "ndjson",
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+    if fmt == "parquet":
+        if not parquet_available():
+            raise RuntimeError("parquet export requires pyarrow")
+        return parquet_stream(db, flt, chunk_size)
+    return ndjson_stream(db, flt, chunk_size)
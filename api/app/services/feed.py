@@ -0,0 +1,365 @@
+"""Query building and rendering for the /events feed.
+
+Shared by the API handlers and by the workers that warm the response cache
+after ingest, so both produce byte-identical pages for the same query.
+"""
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import json
+import os
+import uuid
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import orjson
+from sqlalchemy import cast, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+
+from ..db import SessionLocal
+from ..models import Event, EventEntity
+from ..schemas import EventCompactOut, EventOut
+from . import leaderboard
+from .cache import bump_version, set_cached
+from .entities import entity_key, normalize_name, normalize_ticker
+from .timeline import attach_timelines
+from .translate import translate_events
+
+CACHE_SCOPE = "events"
+# окно "горячей" ленты: без since hotness/relevance смотрят только последние N дней
+# (с EVENTS_PARTITIONING запрос трогает лишь свежие партиции); 0 — вся история
+HOT_WINDOW_DAYS = float(os.getenv("EVENTS_HOT_WINDOW_DAYS", "0"))
+
+EVENT_FIELDS = tuple(EventOut.model_fields)
+COMPACT_FIELDS = tuple(EventCompactOut.model_fields)
+
+
+@dataclass(frozen=True)
+class EventsQuery:
+    """Normalized /events parameters; equal queries produce equal cache keys."""
+    q: Optional[str] = None
+    min_hotness: float = 0.0
+    confirmed: Optional[bool] = None
+    types: tuple[str, ...] = ()
+    order: str = "hotness"
+    offset: int = 0
+    limit: int = 50
+    event_type: Optional[str] = None
+    impact_side: Optional[str] = None
+    min_materiality_ai: float = 0.0
+    lang: Optional[str] = None
+    cursor: Optional[str] = None
+    fields: tuple[str, ...] = ()  # пусто — полный EventOut
+    ticker: Optional[str] = None  # нормализованный тикер (event_entities.ticker)
+    entity: Optional[str] = None  # нормализованное имя сущности (event_entities.key = "n:<entity>")
+    since: Optional[dt.datetime] = None  # first_seen >= since
+
+    @classmethod
+    def from_params(cls, *, q: Optional[str] = None, types: Optional[str] = None,
+                    lang: Optional[str] = None, order: Optional[str] = None,
+                    fields: Optional[str] = None, view: Optional[str] = None,
+                    ticker: Optional[str] = None, entity: Optional[str] = None,
+                    since: Optional[dt.datetime] = None, **kw) -> "EventsQuery":
+        allowed = tuple(sorted({t.strip() for t in (types or "").split(",") if t.strip()}))
+        requested = {f.strip() for f in (fields or "").split(",") if f.strip()}
+        unknown = requested - set(EVENT_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+        compact = (view or "").strip().lower() == "compact"
+        if compact:
+            requested |= set(COMPACT_FIELDS)
+        if requested:
+            requested.add("id")
+        projected = tuple(f for f in EVENT_FIELDS if f in requested)
+        lang = (lang or "").strip().lower() or None
+        q = (q or "").strip() or None
+        # с поиском по умолчанию сортируем по релевантности
+        order = order or ("relevance" if q else "hotness")
+        if order not in ("hotness", "relevance"):
+            order = "recent"
+        if order == "relevance" and not q:
+            order = "hotness"
+        return cls(
+            q=q,
+            types=allowed,
+            lang=None if lang == "en" else lang,
+            order=order,
+            fields=projected,
+            ticker=normalize_ticker(ticker) or None,
+            entity=normalize_name(entity) or None,
+            since=since.replace(tzinfo=dt.timezone.utc) if since and since.tzinfo is None else since,
+            **kw,
+        )
+
+    def cache_key(self) -> str:
+        defaults = EventsQuery()
+        changed = {f.name: getattr(self, f.name) for f in fields(self)
+                   if getattr(self, f.name) != getattr(defaults, f.name)}
+        return json.dumps(changed, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _sort_columns(order: str):
+    # relevance без q (from_params такого не выдаёт) сортируется как hotness
+    return (Event.first_seen, Event.id) if order == "recent" else (Event.hotness, Event.id)
+
+
+def encode_cursor(order: str, e: Event) -> str:
+    """Opaque cursor: the (hotness|first_seen, id) of the last row on the page."""
+    value = e.hotness if order == "hotness" else e.first_seen.isoformat()
+    raw = json.dumps([order, value, str(e.id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(order: str, cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, value, last_id = json.loads(raw)
+        if kind != order:
+            raise InvalidCursor(f"cursor was issued for order={kind}")
+        value = float(value) if order == "hotness" else dt.datetime.fromisoformat(value)
+        return value, uuid.UUID(last_id)
+    except InvalidCursor:
+        raise
+    except Exception as ex:
+        raise InvalidCursor("malformed cursor") from ex
+
+
+def _search_tsquery(q: str):
+    return func.websearch_to_tsquery(cast("english", REGCONFIG), q).op("||")(
+        func.websearch_to_tsquery(cast("russian", REGCONFIG), q)
+    )
+
+
+def _projection_options(fields: tuple[str, ...]) -> list:
+    """Узкий SELECT: только нужные колонки; sources подгружаем, только если их просили."""
+    if not fields:
+        return [selectinload(Event.sources)]
+    # sources и timeline живут в своих таблицах
+    cols = {f for f in fields if f not in ("sources", "timeline")} | {"hotness", "first_seen"}
+    options = [load_only(*(getattr(Event, c) for c in sorted(cols)))]
+    if "sources" in fields:
+        options.append(selectinload(Event.sources))
+    return options
+
+
+def build_events_stmt(query: EventsQuery):
+    stmt = select(Event).options(*_projection_options(query.fields))
+    sort_cols = _sort_columns(query.order)
+    if query.q:
+        # FTS (GIN по search_tsv) + pg_trgm: подстрока и похожее слово в заголовке (опечатки);
+        # q <% headline (word_similarity) поддерживается тем же GIN-индексом, что и ILIKE
+        tsq = _search_tsquery(query.q)
+        stmt = stmt.where(
+            Event.search_tsv.op("@@")(tsq)
+            | Event.headline.ilike(f"%{query.q}%")
+            | literal(query.q).op("<%")(Event.headline)
+        )
+    if query.order == "relevance" and query.q:
+        rank = func.ts_rank_cd(Event.search_tsv, tsq) + func.word_similarity(query.q, Event.headline)
+        stmt = stmt.order_by(rank.desc(), Event.hotness.desc(), Event.id.desc())
+    else:
+        stmt = stmt.order_by(*(c.desc() for c in sort_cols))
+    if query.min_hotness > 0: stmt = stmt.where(Event.hotness >= query.min_hotness)
+    if query.confirmed is not None: stmt = stmt.where(Event.confirmed.is_(query.confirmed))
+    if query.types:
+        stmt = stmt.where(Event.source_types.overlap(list(query.types)))
+    if query.event_type:
+        stmt = stmt.where(Event.event_type == query.event_type)
+    if query.impact_side:
+        stmt = stmt.where(Event.impact_side == query.impact_side)
+    if query.min_materiality_ai > 0:
+        stmt = stmt.where((Event.materiality_ai.is_not(None)) & (Event.materiality_ai >= query.min_materiality_ai))
+    if query.since:
+        stmt = stmt.where(Event.first_seen >= query.since)
+    elif HOT_WINDOW_DAYS > 0 and query.order != "recent":
+        stmt = stmt.where(Event.first_seen >= func.now() - dt.timedelta(days=HOT_WINDOW_DAYS))
+    # ticker/entity — по индексам event_entities (ticker|key, first_seen), без разбора JSONB
+    for cond in ((EventEntity.ticker == query.ticker) if query.ticker else None,
+                 (EventEntity.key == entity_key(query.entity)) if query.entity else None):
+        if cond is None:
+            continue
+        sub = select(EventEntity.event_id).where(cond)
+        if query.since:
+            sub = sub.where(EventEntity.first_seen >= query.since)
+        stmt = stmt.where(Event.id.in_(sub))
+    if query.cursor:
+        if query.order == "relevance":
+            raise InvalidCursor("cursor is not supported for order=relevance; use offset")
+        # keyset: продолжаем строго после последней строки прошлой страницы (offset игнорируется)
+        stmt = stmt.where(tuple_(*sort_cols) < tuple_(*decode_cursor(query.order, query.cursor)))
+        return stmt.limit(query.limit)
+    return stmt.offset(query.offset).limit(query.limit)
+
+
+def _iso(value) -> Optional[str]:
+    """datetime → ISO 8601 как у Pydantic в JSON-режиме (UTC как 'Z')."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = dt.datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    out = value.isoformat()
+    return out[:-6] + "Z" if out.endswith("+00:00") else out
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def _entity(x: dict) -> dict:
+    return {
+        "name": x.get("name"),
+        "type": x.get("type"),
+        "ticker": x.get("ticker"),
+        "exchange": x.get("exchange"),
+        "country": x.get("country"),
+        "sector": x.get("sector"),
+        "source": x.get("source"),
+        "score": _float(x.get("score")),
+    }
+
+
+def _ai_entity(x: dict) -> dict:
+    return {
+        "name": (x.get("name") or (x.get("ticker") or "")),
+        "type": (x.get("type") or ("TICKER" if x.get("ticker") else "ORG")),
+        "ticker": x.get("ticker"),
+        "exchange": x.get("exchange"),
+        "country": x.get("country"),
+        "sector": x.get("sector"),
+        "source": x.get("source"),
+        "score": _float(x.get("score")),
+    }
+
+
+def _draft(d: Optional[dict]) -> Optional[dict]:
+    if not d:
+        return None
+    return {
+        "title": d.get("title"),
+        "lede": d.get("lede"),
+        "bullets": list(d.get("bullets") or []),
+        "quote": d.get("quote"),
+        "attribution": list(d.get("attribution") or []),
+    }
+
+
+# JSON-ready значения полей EventOut прямо из строки, без построения Pydantic-моделей.
+# Порядок ключей и форматы (datetime, float) совпадают с EventOut.model_dump(mode="json").
+# Проекция вызывает только нужные builders, поэтому не загруженные колонки не трогаются.
+_FIELD_BUILDERS = {
+    "id": lambda e: str(e.id),
+    "headline": lambda e: e.headline,
+    "hotness": lambda e: float(e.hotness),
+    "why_now": lambda e: e.why_now,
+    "entities": lambda e: [_entity(x) for x in (e.entities or [])],
+    "timeline": lambda e: [{"t": _iso(x["t"]), "what": x["what"]} for x in (e.recent_timeline or [])],
+    "draft": lambda e: _draft(e.draft),
+    "confirmed": lambda e: bool(e.confirmed),
+    "sources": lambda e: [{"url": s.url, "type": s.type, "first_seen": _iso(s.first_seen)} for s in (e.sources or [])],
+    "event_type": lambda e: e.event_type,
+    "materiality_ai": lambda e: _float(e.materiality_ai),
+    "impact_side": lambda e: e.impact_side,
+    "risk_flags": lambda e: list(e.risk_flags or []),
+    "ai_entities": lambda e: [_ai_entity(x) for x in (e.ai_entities or [])],
+}
+
+
+def _wants_timeline(fields: tuple[str, ...]) -> bool:
+    return not fields or "timeline" in fields
+
+
+def event_dict(e: Event, fields: tuple[str, ...] = ()) -> dict:
+    """JSON-ready dict события: полный EventOut или проекция на ``fields``."""
+    return {f: _FIELD_BUILDERS[f](e) for f in (fields or EVENT_FIELDS)}
+
+
+def dumps(payload) -> str:
+    return orjson.dumps(payload).decode()
+
+
+async def fetch_page(db: AsyncSession, query: EventsQuery) -> tuple[list[dict], Optional[str]]:
+    """Page of events (JSON-ready dicts) plus the cursor of the next page (None on the last page)."""
+    ranked = await leaderboard.page(query)
+    if ranked is not None:
+        # горячая лента: id страницы из Redis, из Postgres — только эти строки
+        items = await fetch_by_ids(db, [x.id for x in ranked], query.fields)
+        next_cursor = None
+        if ranked and len(ranked) >= query.limit:
+            # курсор — по hotness из БД: вторая страница идёт keyset-ом по Postgres
+            last = ranked[-1]
+            hot = await db.scalar(select(Event.hotness).where(Event.id == last.id))
+            next_cursor = encode_cursor(query.order, last if hot is None else leaderboard.Ranked(last.id, hot))
+        return items, next_cursor
+    res = await db.execute(build_events_stmt(query))
+    rows = res.scalars().unique().all()
+    if _wants_timeline(query.fields):
+        await attach_timelines(db, rows)
+    next_cursor = None
+    if rows and len(rows) >= query.limit and query.order != "relevance":
+        next_cursor = encode_cursor(query.order, rows[-1])
+    return [event_dict(e, query.fields) for e in rows], next_cursor
+
+
+async def render_events(db: AsyncSession, query: EventsQuery) -> tuple[str, Optional[str]]:
+    """JSON body of an /events page (translated when ``query.lang`` is set) and next cursor."""
+    out, next_cursor = await fetch_page(db, query)
+    if query.lang:
+        # вся страница — одним пакетным переводом
+        out = await translate_events(out, query.lang)
+    return dumps(out), next_cursor
+
+
+async def fetch_by_ids(db: AsyncSession, ids: list[uuid.UUID], fields: tuple[str, ...] = ()) -> list[dict]:
+    """Events by primary key in the order of ``ids`` (missing ones are skipped)."""
+    if not ids:
+        return []
+    res = await db.execute(select(Event).options(*_projection_options(fields)).where(Event.id.in_(ids)))
+    by_id = {e.id: e for e in res.scalars().unique().all()}
+    if _wants_timeline(fields):
+        await attach_timelines(db, by_id.values())
+    return [event_dict(by_id[i], fields) for i in ids if i in by_id]
+
+
+def pack_page(body: str, next_cursor: Optional[str]) -> str:
+    """Cache value: first line is the next cursor (may be empty), the rest is the body."""
+    return f"{next_cursor or ''}\n{body}"
+
+
+def unpack_page(value: str) -> tuple[str, Optional[str]]:
+    next_cursor, _, body = value.partition("\n")
+    return body, (next_cursor or None)
+
+
+# Views the frontend requests on load: prime them right after ingest commits.
+DEFAULT_VIEWS = (
+    EventsQuery(),
+    EventsQuery(order="recent"),
+    EventsQuery.from_params(types="regulator,news"),
+)
+
+
+async def refresh_cache(views: tuple[EventsQuery, ...] = DEFAULT_VIEWS, version: Optional[int] = None) -> None:
+    """Re-render the default views into the cache under ``version``; without it, bump the data version first."""
+    if version is None:
+        version = await bump_version()
+    if version is None:
+        return
+    async with SessionLocal() as db:
+        await leaderboard.ensure_built(db)
+        for view in views:
+            try:
+                body, next_cursor = await render_events(db, view)
+                await set_cached(version, CACHE_SCOPE, view.cache_key(), pack_page(body, next_cursor))
+            except Exception as e:
+                print(f"[cache][ERR warm] {view.cache_key()}: {e}", flush=True)
+
@@ -1,30 +1,16 @@
 # api/app/services/generate.py
 import os, json, re, textwrap, difflib
-import httpx, certifi
 
-# ---------- утилиты извлечения текста ----------
+from .content import fetch_article
+from .keywords import KeywordMatcher
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (compatible; FinNewsHot/0.1; +http://localhost)",
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-}
+# ---------- утилиты извлечения текста ----------
 
 def _clean(text: str, limit: int | None = None) -> str:
     if not text: return ""
     text = re.sub(r"\s+", " ", text).strip()
     return text[:limit] if limit else text
 
-def _strip_html(html: str) -> str:
-    html = re.sub(r"(?is)<script.*?</script>|<style.*?</style>", " ", html or "")
-    text = re.sub(r"(?is)<[^>]+>", " ", html)
-    return _clean(text, 4000)
-
-def _meta_desc(html: str) -> str:
-    m = re.search(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\']([^"\']+)["\']', html or "")
-    if m: return _clean(m.group(1), 400)
-    m = re.search(r'(?is)<meta[^>]+property=["\']og:description["\'][^>]+content=["\']([^"\']+)["\']', html or "")
-    return _clean(m.group(1), 400) if m else ""
-
 def _sentences(txt: str) -> list[str]:
     s = re.split(r"(?<=[.!?])\s+", txt or "")
     return [x.strip() for x in s if 40 <= len(x.strip()) <= 220]
@@ -38,25 +24,14 @@ def _fetch_context(sources: list[dict], max_sources=2, max_chars=2000) -> tuple[
             if len(urls) >= max_sources: break
     if not urls: return "", []
 
-    # trafilatura как «лучше», html+meta — фолбэк
-    try:
-        try:
-            from trafilatura import extract as trafi_extract  # lazy import
-        except Exception:
-            trafi_extract = None
-        parts = []
-        with httpx.Client(follow_redirects=True, timeout=20, verify=certifi.where(), headers=HEADERS) as c:
-            for u in urls:
-                try:
-                    r = c.get(u)
-                    txt = (trafi_extract(r.content) if trafi_extract else "") or _meta_desc(r.text) or _strip_html(r.text)
-                    if txt:
-                        parts.append(f"[{u}]\n{_clean(txt, max_chars//max_sources)}")
-                except Exception:
-                    continue
-        return ("\n\n".join(parts)[:max_chars], urls)
-    except Exception:
-        return "", urls
+    # общее хранилище контента: страницу, уже скачанную ingest, повторно не качаем
+    parts = []
+    for u in urls:
+        art = fetch_article(u)
+        txt = art.best if art else ""
+        if txt:
+            parts.append(f"[{u}]\n{_clean(txt, max_chars//max_sources)}")
+    return ("\n\n".join(parts)[:max_chars], urls)
 
 # ---------- эвристика оформления черновика ----------
 
@@ -69,14 +44,21 @@ def _paraphrase_title(headline: str) -> str:
     h = re.sub(r"\s*-\s*Press Release$", "", h, flags=re.I)
     return (h[:87] + "…") if len(h) > 90 else h
 
+# целые слова — как раньше \b...\b («fine» не ловит finest, «order» — orderly)
+KEY_WORDS = ("enforcement", "fine", "order", "dividend", "buyback", "guidance", "approval", "agenda", "panel",
+             "conference", "termination", "appointment", "charged")
+# основы слов: «penalt» ловит penalty/penalties, «merg» — merger/merged (целым словом они не встречаются)
+KEY_STEMS = ("penalt", "investig", "settle", "merg", "acquisit")
+_KEY_WORDS = KeywordMatcher(((k, True) for k in KEY_WORDS), mode="word")
+_KEY_STEMS = KeywordMatcher(((k, True) for k in KEY_STEMS), mode="prefix")
+
 def _key_sents(ctx: str) -> list[str]:
     sents = _sentences(ctx)
     if not sents: return []
-    pat = re.compile(r"\b(enforcement|fine|penalt|investig|order|settle|merg|acquisit|dividend|buyback|guidance|approval|agenda|panel|conference|termination|appointment|charged)\b", re.I)
     scored = []
-    for s in sents:
+    for s, words, stems in zip(sents, _KEY_WORDS.hits_many(sents), _KEY_STEMS.hits_many(sents)):
         score = 0
-        if pat.search(s): score += 2
+        if words or stems: score += 2
         if len(s) > 120: score += 1
         scored.append((score, s))
     scored.sort(reverse=True, key=lambda x: x[0])
@@ -0,0 +1,209 @@
+"""In-process queue for draft generation backed by the generation_jobs table.
+
+The blocking generator (page downloads + LLM) runs in a worker thread, bounded
+by GENERATION_CONCURRENCY, so the event loop keeps serving other requests.
+A partial unique index on generation_jobs makes enqueueing single-flight per
+event, also across API processes; a job is run by whichever process moves it
+from queued to running first (conditional UPDATE), and a running job keeps its
+``updated_at`` fresh with a heartbeat so only abandoned ones are re-queued.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import os
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from ..db import SessionLocal
+from ..models import Event, GenerationJob
+from .cache import bump_version
+from .generate import gen_why_now_and_draft
+
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "2"))
+ACTIVE = ("queued", "running")
+# running-задача без heartbeat дольше этого считается брошенной (процесс упал)
+STALE_AFTER_SECONDS = float(os.getenv("GENERATION_STALE_SECONDS", "300"))
+HEARTBEAT_SECONDS = max(5.0, STALE_AFTER_SECONDS / 5)
+
+
+def _fallback_payload(e: Event) -> dict:
+    # фолбэк, чтобы не падать на демо без ключа
+    return {
+        "why_now": e.why_now or "Важно сейчас: обновление от первоисточника/регулятора.",
+        "draft": e.draft or {
+            "title": e.headline,
+            "lede": "Кратко: ключевые детали и контекст будут уточняться.",
+            "bullets": ["Источник: см. ссылки ниже", "Подтверждение: есть", "Следим за обновлениями"],
+            "quote": "",
+            "attribution": [s.url for s in e.sources[:3]],
+        },
+    }
+
+
+class GenerationQueue:
+    def __init__(self, concurrency: int = GENERATION_CONCURRENCY) -> None:
+        self._concurrency = max(1, concurrency)
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._tasks: dict[uuid.UUID, asyncio.Task] = {}
+
+    async def enqueue(self, event_id: uuid.UUID) -> GenerationJob:
+        """Returns the active job for the event or creates a new one."""
+        async with SessionLocal() as db:
+            job = await self._active(db, event_id)
+            if job is not None:
+                return await self._revive(db, job)
+            job = GenerationJob(event_id=event_id, status="queued")
+            db.add(job)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # параллельный запрос успел создать задачу — возвращаем её
+                await db.rollback()
+                job = await self._active(db, event_id)
+                if job is not None:
+                    return await self._revive(db, job)
+                raise
+        self._schedule(job.id)
+        return job
+
+    async def get(self, job_id: uuid.UUID) -> Optional[GenerationJob]:
+        async with SessionLocal() as db:
+            return await db.get(GenerationJob, job_id)
+
+    async def resume(self) -> None:
+        """On startup: re-queue abandoned running jobs (no heartbeat) and schedule queued ones."""
+        async with SessionLocal() as db:
+            async with db.begin():
+                await db.execute(self._requeue_stale())
+            ids = (await db.execute(
+                select(GenerationJob.id).where(GenerationJob.status == "queued")
+            )).scalars().all()
+        for job_id in ids:
+            self._schedule(job_id)
+
+    async def close(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    @staticmethod
+    def _requeue_stale(*where):
+        # живые задачи других процессов (и соседа при rolling restart) не трогаем — только без heartbeat
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=STALE_AFTER_SECONDS)
+        return (update(GenerationJob)
+                .where(GenerationJob.status == "running", GenerationJob.updated_at < cutoff, *where)
+                .values(status="queued"))
+
+    async def _revive(self, db, job: GenerationJob) -> GenerationJob:
+        """
+        Existing active job: make sure something will run it. A running job without a
+        heartbeat goes back to queued; a queued one is scheduled here too (the claim
+        decides which process actually runs it).
+        """
+        if job.status == "running":
+            revived = (await db.execute(
+                self._requeue_stale(GenerationJob.id == job.id).returning(GenerationJob.id)
+            )).first()
+            await db.commit()
+            if revived is None:
+                return job
+            await db.refresh(job)
+        if job.status == "queued":
+            self._schedule(job.id)
+        return job
+
+    async def _active(self, db, event_id: uuid.UUID) -> Optional[GenerationJob]:
+        return (await db.execute(
+            select(GenerationJob).where(GenerationJob.event_id == event_id, GenerationJob.status.in_(ACTIVE))
+        )).scalars().first()
+
+    def _schedule(self, job_id: uuid.UUID) -> None:
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(job_id, None))
+
+    async def _set_status(self, job_id: uuid.UUID, status: str, error: Optional[str] = None) -> None:
+        async with SessionLocal() as db:
+            async with db.begin():
+                await db.execute(
+                    update(GenerationJob).where(GenerationJob.id == job_id).values(status=status, error=error)
+                )
+
+    async def _claim(self, job_id: uuid.UUID) -> bool:
+        """queued → running in one conditional UPDATE; False if another process got it first."""
+        async with SessionLocal() as db:
+            async with db.begin():
+                row = (await db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == job_id, GenerationJob.status == "queued")
+                    .values(status="running")
+                    .returning(GenerationJob.id)
+                )).first()
+        return row is not None
+
+    async def _heartbeat(self, job_id: uuid.UUID) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                async with SessionLocal() as db:
+                    async with db.begin():
+                        await db.execute(
+                            update(GenerationJob)
+                            .where(GenerationJob.id == job_id, GenerationJob.status == "running")
+                            .values(updated_at=func.now())
+                        )
+            except Exception as ex:
+                print(f"[generate][WARN heartbeat] {job_id}: {ex!r}", flush=True)
+
+    async def _run(self, job_id: uuid.UUID) -> None:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._concurrency)
+        async with self._sem:
+            if not await self._claim(job_id):
+                return
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                async with SessionLocal() as db:
+                    job = await db.get(GenerationJob, job_id)
+                    e = (await db.execute(
+                        select(Event).options(selectinload(Event.sources)).where(Event.id == job.event_id)
+                    )).scalars().first()
+                if e is None:
+                    await self._set_status(job_id, "failed", "event not found")
+                    return
+                # сессия уже закрыта: соединение пула не держим, пока идут загрузки страниц и LLM
+                try:
+                    payload = await asyncio.to_thread(
+                        gen_why_now_and_draft,
+                        e.headline,
+                        [{"url": s.url} for s in e.sources],
+                        seed_text=e.why_now,
+                    )
+                except Exception as ex:
+                    print(f"[generate][ERR] {e.id}: {ex!r}", flush=True)
+                    payload = _fallback_payload(e)
+                async with SessionLocal() as db:
+                    async with db.begin():
+                        await db.execute(update(Event).where(Event.id == e.id).values(
+                            why_now=payload.get("why_now") or e.why_now,
+                            draft=payload.get("draft") or e.draft,
+                        ))
+                await bump_version()
+                await self._set_status(job_id, "done")
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                await self._set_status(job_id, "failed", repr(ex)[:500])
+            finally:
+                heartbeat.cancel()
+
+
+generation_queue = GenerationQueue()
@@ -0,0 +1,112 @@
+"""Compiled multi-keyword matcher shared by the keyword scorers.
+
+Every keyword table (materiality weights, heuristic event types, impact words,
+draft key-sentence stems) is built once into a matcher, and a scorer works on
+the set of hit keys instead of looping over its table. Word and prefix tables
+compile into one trie-shaped regex (keys sharing a prefix share a branch), so a
+text is scanned in one pass; ``hits_many`` scans a batch with one ``finditer``
+over the joined string. Plain substring tables keep ``key in text``: for a few
+dozen keys CPython's substring search beats any single regex pass.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+from typing import Generic, Iterable, Mapping, TypeVar, Union
+
+V = TypeVar("V")
+
+MODES = ("substring", "word", "prefix")
+_SEP = "\x00"  # ни один ключ его не содержит — совпадение не перейдёт через границу текстов
+
+
+def _trie_pattern(keys: Iterable[str]) -> str:
+    """Alternation of ``keys`` factored by common prefixes; greedy, so the longest key wins."""
+    root: dict = {}
+    for key in keys:
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(root)
+
+
+class KeywordMatcher(Generic[V]):
+    """
+    Keyword table compiled for one-pass matching. Modes:
+    - ``substring``: ``key in text`` semantics;
+    - ``word``: whole words (``\\bkey\\b``);
+    - ``prefix``: words starting with the key (stems like ``investig``).
+    Matching is case-insensitive: keys and texts are lowercased.
+    Table order is the priority order used by ``first``.
+    """
+
+    def __init__(self, table: Union[Mapping[str, V], Iterable[tuple[str, V]]], mode: str = "word"):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode: {mode}")
+        items = table.items() if isinstance(table, Mapping) else table
+        self.mode = mode
+        self._values: dict[str, V] = {}
+        self._rank: dict[str, int] = {}
+        for key, value in items:
+            key = key.lower()
+            if key and key not in self._values:
+                self._values[key] = value
+                self._rank[key] = len(self._rank)
+        self._keys = tuple(self._values)
+        body = _trie_pattern(self._keys) or r"(?!)"
+        self._re = re.compile(rf"\b({body})\b" if mode == "word" else rf"\b({body})\w*")
+        # префиксы: слово с «penalt» начинается и с любого более короткого ключа-префикса
+        self._implied: dict[str, frozenset[str]] = {
+            k: frozenset(j for j in self._keys if k.startswith(j)) if mode == "prefix" else frozenset((k,))
+            for k in self._keys
+        }
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def hits(self, text: str) -> set[str]:
+        """Keys found in ``text``."""
+        t = (text or "").lower()
+        if self.mode == "substring":
+            return {k for k in self._keys if k in t}
+        out: set[str] = set()
+        for m in self._re.finditer(t):
+            out |= self._implied[m.group(1)]
+        return out
+
+    def hits_many(self, texts: Iterable[str]) -> list[set[str]]:
+        """``hits`` for every text, in one scan of the joined batch."""
+        texts = [(t or "").lower() for t in texts]
+        if self.mode == "substring":
+            return [{k for k in self._keys if k in t} for t in texts]
+        starts, pos = [], 0
+        for t in texts:
+            starts.append(pos)
+            pos += len(t) + len(_SEP)
+        out: list[set[str]] = [set() for _ in texts]
+        if not texts:
+            return out
+        for m in self._re.finditer(_SEP.join(texts)):
+            out[bisect.bisect_right(starts, m.start()) - 1] |= self._implied[m.group(1)]
+        return out
+
+    def value(self, key: str) -> V:
+        return self._values[key]
+
+    def first(self, hits: Iterable[str], default: V) -> V:
+        """Value of the highest-priority (earliest in the table) hit."""
+        best = min(hits, key=self._rank.__getitem__, default=None)
+        return default if best is None else self._values[best]
+
+    def best(self, hits: Iterable[str], default: V) -> V:
+        """Largest value among the hits (weights)."""
+        return max((self._values[k] for k in hits), default=default)
@@ -0,0 +1,173 @@
+"""Redis sorted-set leaderboard of event ids by hotness.
+
+Writers ``ZADD`` every scored event into ``lb:hot:all`` and into the per
+``event_type`` / ``impact_side`` sets, trimming each to the top
+``LEADERBOARD_SIZE``; an event whose type or side changed is removed from the
+sets it no longer belongs to. The default hotness views (no filter or exactly
+one of event_type / impact_side) then read a page of ids with ``ZREVRANGE`` and
+fetch only those rows, instead of sorting ``events`` on every request. A set
+with fewer than ``LEADERBOARD_SIZE`` members may have lost members it cannot
+get back (trimmed earlier, then others left), so such views go to Postgres.
+Archiving rebuilds all sets.
+"""
+from __future__ import annotations
+
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Event
+from .cache import get_redis
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "1000"))
+KEY_ALL = "lb:hot:all"
+BUILT_KEY = "lb:hot:built"  # наборы заполнены rebuild; до этого читаем из Postgres
+SETS_KEY = "lb:hot:sets"    # имена всех наборов по event_type / impact_side
+
+
+def _type_key(event_type: str) -> str:
+    return f"lb:hot:type:{event_type}"
+
+
+def _side_key(impact_side: str) -> str:
+    return f"lb:hot:side:{impact_side}"
+
+
+@dataclass(frozen=True)
+class Ranked:
+    """Leaderboard entry; also what ``encode_cursor`` reads."""
+    id: uuid.UUID
+    hotness: float
+
+
+def leaderboard_key(query) -> Optional[str]:
+    """Set serving ``query`` or None if the view needs Postgres (other filters, cursor, search, window)."""
+    from .feed import HOT_WINDOW_DAYS  # feed импортирует этот модуль
+
+    if query.order != "hotness" or query.q or query.cursor or HOT_WINDOW_DAYS > 0:
+        return None
+    if (query.min_hotness > 0 or query.confirmed is not None or query.types or query.min_materiality_ai > 0
+            or query.ticker or query.entity or query.since):
+        return None
+    if query.event_type and query.impact_side:
+        return None
+    if query.offset + query.limit > LEADERBOARD_SIZE:
+        return None
+    if query.event_type:
+        return _type_key(query.event_type)
+    if query.impact_side:
+        return _side_key(query.impact_side)
+    return KEY_ALL
+
+
+def _keys_for(n: dict) -> list[str]:
+    keys = [KEY_ALL]
+    if n.get("event_type"):
+        keys.append(_type_key(n["event_type"]))
+    if n.get("impact_side"):
+        keys.append(_side_key(n["impact_side"]))
+    return keys
+
+
+async def record(scored: Iterable[dict]) -> None:
+    """ZADD scored events (``event_notice`` dicts) and trim every touched set to the top N."""
+    scored = [n for n in scored if n.get("hotness") is not None]
+    if not scored:
+        return
+    r = await get_redis()
+    if r is None:
+        return
+    touched: dict[str, dict[str, float]] = {}
+    for n in scored:
+        for key in _keys_for(n):
+            touched.setdefault(key, {})[str(n["id"])] = float(n["hotness"])
+    ids = {str(n["id"]) for n in scored}
+    try:
+        known = set(await r.smembers(SETS_KEY))
+        pipe = r.pipeline(transaction=False)
+        # тип/сторона события сменились — убираем его из наборов, где его больше быть не должно
+        for key in known - {KEY_ALL}:
+            gone = [i for i in ids if i not in touched.get(key, {})]
+            if gone:
+                pipe.zrem(key, *gone)
+        for key, members in touched.items():
+            pipe.zadd(key, members)
+            pipe.zremrangebyrank(key, 0, -(LEADERBOARD_SIZE + 1))
+        new_sets = set(touched) - known - {KEY_ALL}
+        if new_sets:
+            pipe.sadd(SETS_KEY, *new_sets)
+        await pipe.execute()
+    except Exception as e:
+        print(f"[leaderboard][ERR record] {e}", flush=True)
+
+
+async def page(query) -> Optional[list[Ranked]]:
+    """Ids of one page from Redis, or None when the view must go to Postgres."""
+    key = leaderboard_key(query)
+    if key is None:
+        return None
+    r = await get_redis()
+    if r is None:
+        return None
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.exists(BUILT_KEY)
+        pipe.zcard(key)
+        # одинаковые hotness: порядок по id убыванием, как ORDER BY hotness DESC, id DESC
+        pipe.zrevrange(key, query.offset, query.offset + query.limit - 1, withscores=True)
+        built, size, rows = await pipe.execute()
+    except Exception:
+        return None
+    # неполный набор: урезанные раньше события назад не вернутся — такой вид отдаёт Postgres
+    if not built or size < LEADERBOARD_SIZE:
+        return None
+    return [Ranked(uuid.UUID(m), float(s)) for m, s in rows]
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """Fill every set from Postgres (first run, Redis flush). Writers keep it current afterwards."""
+    r = await get_redis()
+    if r is None:
+        return
+    top = Event.hotness.desc(), Event.id.desc()
+    sets: dict[str, dict[str, float]] = {}
+    rows = (await db.execute(select(Event.id, Event.hotness).order_by(*top).limit(LEADERBOARD_SIZE))).all()
+    sets[KEY_ALL] = {str(i): float(h) for i, h in rows}
+    for col, key_fn in ((Event.event_type, _type_key), (Event.impact_side, _side_key)):
+        values = (await db.execute(select(col).where(col.is_not(None)).distinct())).scalars().all()
+        for value in values:
+            rows = (await db.execute(
+                select(Event.id, Event.hotness).where(col == value).order_by(*top).limit(LEADERBOARD_SIZE)
+            )).all()
+            sets[key_fn(value)] = {str(i): float(h) for i, h in rows}
+    try:
+        pipe = r.pipeline(transaction=True)
+        stale = [k async for k in r.scan_iter(match="lb:hot:*")]
+        if stale:
+            pipe.delete(*stale)
+        for key, members in sets.items():
+            if members:
+                pipe.zadd(key, members)
+        filtered = [k for k, members in sets.items() if members and k != KEY_ALL]
+        if filtered:
+            pipe.sadd(SETS_KEY, *filtered)
+        pipe.set(BUILT_KEY, "1")
+        await pipe.execute()
+    except Exception as e:
+        print(f"[leaderboard][ERR rebuild] {e}", flush=True)
+
+
+async def ensure_built(db: AsyncSession) -> None:
+    r = await get_redis()
+    if r is None:
+        return
+    try:
+        if await r.exists(BUILT_KEY):
+            return
+    except Exception:
+        return
+    await rebuild(db)
@@ -0,0 +1,270 @@
+"""In-memory /events engine over an exported snapshot (demos, load tests, DB outages).
+
+The snapshot (a JSON list of EventOut objects) is parsed once, each event is
+pre-serialized with orjson, and sorted orders plus posting sets for the
+filterable fields are built up front; a request then only walks integer
+positions and joins ready bytes. Filter, sort, cursor and projection semantics
+follow ``build_events_stmt``; search is a case-insensitive substring match
+instead of FTS + pg_trgm, and ``lang`` is ignored (translation needs the DB).
+"""
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+import orjson
+from pydantic import ValidationError
+
+from ..schemas import EventOut
+from .entities import entity_key, entity_keys
+from .feed import EventsQuery, InvalidCursor, decode_cursor, encode_cursor
+
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "0").lower() in {"1", "true", "yes"}
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def _default_path() -> str:
+    # в контейнере api/ смонтирован как /app, а offline/ — как /app/offline
+    api_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for base in (api_dir, os.path.dirname(api_dir)):
+        p = os.path.join(base, "offline", "events.sample.json")
+        if os.path.exists(p):
+            return p
+    return os.path.join(os.path.dirname(api_dir), "offline", "events.sample.json")
+
+
+def snapshot_path() -> str:
+    return os.getenv("OFFLINE_SNAPSHOT") or _default_path()
+
+
+@dataclass(frozen=True)
+class _Row:
+    """Sort keys of one event; also what ``encode_cursor`` reads."""
+    id: str
+    hotness: float
+    first_seen: dt.datetime
+
+
+def _aware(value: Optional[str]) -> Optional[dt.datetime]:
+    if not value:
+        return None
+    try:
+        t = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return t if t.tzinfo else t.replace(tzinfo=dt.timezone.utc)
+
+
+def _first_seen(raw: dict, doc: dict) -> dt.datetime:
+    """EventOut has no first_seen: take it from the raw row, else the earliest source/timeline time."""
+    t = _aware(raw.get("first_seen"))
+    if t is not None:
+        return t
+    seen = [_aware(s["first_seen"]) for s in doc["sources"]] + [_aware(x["t"]) for x in doc["timeline"]]
+    seen = [t for t in seen if t is not None]
+    return min(seen) if seen else _EPOCH
+
+
+class OfflineSnapshot:
+    def __init__(self, events: Iterable[dict], version: str = "0"):
+        self.version = version
+        self._docs: list[dict] = []
+        self._blobs: list[bytes] = []
+        self._rows: list[_Row] = []
+        self._text: list[str] = []
+        self._headline: list[str] = []
+        self._by_id: dict[str, int] = {}
+        self._by_event_type: dict[str, set[int]] = {}
+        self._by_side: dict[str, set[int]] = {}
+        self._by_source_type: dict[str, set[int]] = {}
+        self._confirmed: set[int] = set()
+        self._by_entity_key: dict[str, set[int]] = {}
+        self._by_ticker: dict[str, set[int]] = {}
+        for raw in events:
+            try:
+                doc = EventOut.model_validate(raw).model_dump(mode="json")
+            except ValidationError as e:
+                print(f"[offline][WARN] skip event {raw.get('id') if isinstance(raw, dict) else '?'}: {e.errors()[:1]}", flush=True)
+                continue
+            if doc["id"] in self._by_id:
+                continue
+            i = len(self._docs)
+            self._docs.append(doc)
+            self._blobs.append(orjson.dumps(doc))
+            self._rows.append(_Row(doc["id"], doc["hotness"], _first_seen(raw, doc)))
+            self._headline.append(doc["headline"].casefold())
+            self._text.append(" ".join([doc["headline"], doc["why_now"] or ""]
+                                       + [x["name"] for x in doc["entities"]]).casefold())
+            self._by_id[doc["id"]] = i
+            if doc["event_type"]:
+                self._by_event_type.setdefault(doc["event_type"], set()).add(i)
+            if doc["impact_side"]:
+                self._by_side.setdefault(doc["impact_side"], set()).add(i)
+            for t in {s["type"] for s in doc["sources"]}:
+                self._by_source_type.setdefault(t, set()).add(i)
+            if doc["confirmed"]:
+                self._confirmed.add(i)
+            for key, ent in entity_keys(doc["entities"], doc["ai_entities"]).items():
+                self._by_entity_key.setdefault(key, set()).add(i)
+                if ent["ticker"]:
+                    self._by_ticker.setdefault(ent["ticker"], set()).add(i)
+        # возрастающие порядки (value, id) — keyset-курсор ищем бинарным поиском
+        self._orders: dict[str, tuple[list[int], list[tuple]]] = {}
+        for order in ("hotness", "recent"):
+            key = self._key_fn(order)
+            asc = sorted(range(len(self._rows)), key=key)
+            self._orders[order] = (asc, [key(i) for i in asc])
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _key_fn(self, order: str):
+        rows = self._rows
+        if order == "hotness":
+            return lambda i: (rows[i].hotness, rows[i].id)
+        return lambda i: (rows[i].first_seen, rows[i].id)
+
+    def _candidates(self, query: EventsQuery) -> Optional[set[int]]:
+        """Intersection of the posting sets for indexed filters; None means 'all events'."""
+        sets: list[set[int]] = []
+        if query.event_type:
+            sets.append(self._by_event_type.get(query.event_type, set()))
+        if query.impact_side:
+            sets.append(self._by_side.get(query.impact_side, set()))
+        if query.types:
+            sets.append(set().union(*(self._by_source_type.get(t, set()) for t in query.types)))
+        if query.confirmed is True:
+            sets.append(self._confirmed)
+        if query.ticker:
+            sets.append(self._by_ticker.get(query.ticker, set()))
+        if query.entity:
+            sets.append(self._by_entity_key.get(entity_key(query.entity), set()))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        out = set(sets[0])
+        for s in sets[1:]:
+            out &= s
+        return out
+
+    def _matches(self, i: int, query: EventsQuery, terms: tuple[str, ...]) -> bool:
+        if query.confirmed is False and i in self._confirmed:
+            return False
+        if query.min_hotness > 0 and self._rows[i].hotness < query.min_hotness:
+            return False
+        if query.since and self._rows[i].first_seen < query.since:
+            return False
+        if query.min_materiality_ai > 0:
+            m = self._docs[i]["materiality_ai"]
+            if m is None or m < query.min_materiality_ai:
+                return False
+        if terms:
+            text = self._text[i]
+            return all(t in text for t in terms)
+        return True
+
+    def _walk(self, query: EventsQuery, candidates: Optional[set[int]]) -> Iterator[int]:
+        """Positions in descending (value, id) order, strictly after the cursor if given."""
+        asc, keys = self._orders[query.order]
+        key = self._key_fn(query.order)
+        if query.cursor:
+            value, last_id = decode_cursor(query.order, query.cursor)
+            if query.order == "recent" and value.tzinfo is None:
+                value = value.replace(tzinfo=dt.timezone.utc)
+            bound = (value, str(last_id))
+        else:
+            bound = None
+        # мало кандидатов — сортируем только их, иначе идём по готовому порядку
+        if candidates is not None and len(candidates) * 4 < len(asc):
+            ordered = sorted(candidates, key=key, reverse=True)
+            for i in ordered:
+                if bound is None or key(i) < bound:
+                    yield i
+            return
+        end = bisect.bisect_left(keys, bound) if bound is not None else len(asc)
+        for j in range(end - 1, -1, -1):
+            i = asc[j]
+            if query.order == "hotness" and keys[j][0] < query.min_hotness:
+                return
+            if candidates is None or i in candidates:
+                yield i
+
+    def _relevance(self, positions: Iterable[int], q: str, terms: tuple[str, ...]) -> list[int]:
+        def score(i: int):
+            head = self._headline[i]
+            s = sum(t in head for t in terms) / len(terms) + (1.0 if q in head else 0.0)
+            return (s, self._rows[i].hotness, self._rows[i].id)
+        return sorted(positions, key=score, reverse=True)
+
+    def page(self, query: EventsQuery) -> tuple[list[int], Optional[str]]:
+        """Positions of one page plus the cursor of the next page (None on the last page)."""
+        candidates = self._candidates(query)
+        q = (query.q or "").casefold()
+        terms = tuple(q.split())
+        if query.order == "relevance":
+            if query.cursor:
+                raise InvalidCursor("cursor is not supported for order=relevance; use offset")
+            pool = candidates if candidates is not None else range(len(self._rows))
+            hits = self._relevance((i for i in pool if self._matches(i, query, terms)), q, terms)
+            return hits[query.offset:query.offset + query.limit], None
+        skip = 0 if query.cursor else query.offset
+        out: list[int] = []
+        for i in self._walk(query, candidates):
+            if not self._matches(i, query, terms):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            out.append(i)
+            if len(out) >= query.limit:
+                break
+        next_cursor = None
+        if out and len(out) >= query.limit:
+            next_cursor = encode_cursor(query.order, self._rows[out[-1]])
+        return out, next_cursor
+
+    def render(self, query: EventsQuery) -> tuple[bytes, Optional[str]]:
+        """JSON body of an /events page and the next cursor."""
+        positions, next_cursor = self.page(query)
+        if not query.fields:
+            return b"[" + b",".join(self._blobs[i] for i in positions) + b"]", next_cursor
+        docs = self._docs
+        return orjson.dumps([{f: docs[i][f] for f in query.fields} for i in positions]), next_cursor
+
+    def get(self, event_id: str) -> Optional[bytes]:
+        i = self._by_id.get(event_id)
+        return None if i is None else self._blobs[i]
+
+
+def load_snapshot(path: str) -> OfflineSnapshot:
+    with open(path, "rb") as f:
+        data = f.read()
+    st = os.stat(path)
+    events = orjson.loads(data) if data.strip() else []
+    if isinstance(events, dict):
+        events = events.get("events") or []
+    return OfflineSnapshot(events, version=f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+
+_snapshot: Optional[OfflineSnapshot] = None
+_snapshot_stamp: Optional[tuple] = None
+
+
+def get_snapshot() -> OfflineSnapshot:
+    """Process-wide snapshot; re-read only when the file changes on disk."""
+    global _snapshot, _snapshot_stamp
+    path = snapshot_path()
+    try:
+        st = os.stat(path)
+        stamp = (path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = (path, None, None)
+    if _snapshot is None or stamp != _snapshot_stamp:
+        _snapshot = load_snapshot(path) if stamp[1] is not None else OfflineSnapshot([])
+        _snapshot_stamp = stamp
+        print(f"[offline] loaded {len(_snapshot)} events from {path}", flush=True)
+    return _snapshot
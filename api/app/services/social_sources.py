@@ -4,8 +4,9 @@ from __future__ import annotations
 
 import datetime as dt
 import re
-from dataclasses import dataclass
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
 
 from pydantic import BaseModel
 
@@ -30,6 +31,9 @@ class SocialPost:
     author: str | None
     created_at: dt.datetime | None
     raw: dict
+    query: str | None = None
+    # курсоры всех запросов, вернувших пост (после дедупа он один на несколько запросов)
+    cursor_keys: List[str] = field(default_factory=list)
 
 
 class SocialConfig(BaseModel):
@@ -37,6 +41,7 @@ class SocialConfig(BaseModel):
     linkedin_queries: List[str] = []
     limit_per_query: int = 10
     linkedin_region: str | None = None  # e.g. "ru-ru"
+    max_workers: int = 4  # bounded pool for blocking snscrape/DDGS iterators
 
 
 def _normalise_title(text: str, fallback_prefix: str) -> str:
@@ -47,16 +52,33 @@ def _normalise_title(text: str, fallback_prefix: str) -> str:
     return text if len(text) <= 120 else text[:117] + "..."
 
 
-def fetch_twitter_posts(query: str, limit: int) -> List[SocialPost]:
+def cursor_key(platform: str, query: str) -> str:
+    return f"{platform}:{query}"
+
+
+def _tweet_id(value: str | None) -> int | None:
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_twitter_posts(query: str, limit: int, since_id: str | None = None) -> List[SocialPost]:
+    """Latest tweets for ``query``; with ``since_id`` only tweets newer than that id."""
     if not query or limit <= 0:
         return []
     if sntwitter is None:
         return []
 
+    floor = _tweet_id(since_id)
+    search = f"{query} since_id:{floor}" if floor else query
     results: List[SocialPost] = []
     try:
-        scraper = sntwitter.TwitterSearchScraper(query)
+        scraper = sntwitter.TwitterSearchScraper(search)
         for item in scraper.get_items():
+            item_id = _tweet_id(str(getattr(item, "id", "")))
+            if floor and item_id is not None and item_id <= floor:
+                break  # results are newest-first: everything below was already stored
             created = getattr(item, "date", None)
             username = getattr(getattr(item, "user", None), "username", None)
             results.append(
@@ -74,6 +96,7 @@ def fetch_twitter_posts(query: str, limit: int) -> List[SocialPost]:
                         "retweetCount": getattr(item, "retweetCount", None),
                         "likeCount": getattr(item, "likeCount", None),
                     },
+                    query=query,
                 )
             )
             if len(results) >= limit:
@@ -83,7 +106,10 @@ def fetch_twitter_posts(query: str, limit: int) -> List[SocialPost]:
     return results
 
 
-def fetch_linkedin_posts(query: str, limit: int, region: str | None = None) -> List[SocialPost]:
+def fetch_linkedin_posts(
+    query: str, limit: int, region: str | None = None, since: dt.datetime | None = None
+) -> List[SocialPost]:
+    """LinkedIn posts via DuckDuckGo news; with ``since`` drops posts not newer than it."""
     if not query or limit <= 0:
         return []
     if DDGS is None:
@@ -106,6 +132,8 @@ def fetch_linkedin_posts(query: str, limit: int, region: str | None = None) -> L
                         created_at = dt.datetime.fromisoformat(pub_date.replace("Z", "+00:00"))
                     except Exception:
                         created_at = None
+                if since and created_at and created_at <= since:
+                    continue
                 results.append(
                     SocialPost(
                         platform="social_linkedin",
@@ -116,6 +144,7 @@ def fetch_linkedin_posts(query: str, limit: int, region: str | None = None) -> L
                         author=None,
                         created_at=created_at,
                         raw=item,
+                        query=query,
                     )
                 )
     except Exception:
@@ -123,27 +152,81 @@ def fetch_linkedin_posts(query: str, limit: int, region: str | None = None) -> L
     return results
 
 
-def collect_social_posts(config: SocialConfig) -> List[SocialPost]:
-    posts: List[SocialPost] = []
-    seen: set[str] = set()
-
-    for query in config.twitter_queries:
-        for post in fetch_twitter_posts(query, config.limit_per_query):
-            key = post.id or post.url
-            if key and key in seen:
-                continue
-            if key:
-                seen.add(key)
-            posts.append(post)
+def _parse_ts(value: str | None) -> dt.datetime | None:
+    if not value:
+        return None
+    try:
+        ts = dt.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=dt.timezone.utc)
+
+
+def _advance_cursor(platform: str, current: str | None, posts: List[SocialPost]) -> str | None:
+    """New high-water mark: max tweet id for Twitter, max created_at (ISO) for LinkedIn."""
+    if platform == "social_twitter":
+        ids = [i for i in (_tweet_id(p.id) for p in posts) if i is not None]
+        floor = _tweet_id(current)
+        if floor is not None:
+            ids.append(floor)
+        return str(max(ids)) if ids else current
+    stamps = [p.created_at if p.created_at.tzinfo else p.created_at.replace(tzinfo=dt.timezone.utc)
+              for p in posts if p.created_at]
+    since = _parse_ts(current)
+    if since is not None:
+        stamps.append(since)
+    return max(stamps).isoformat() if stamps else current
+
+
+def collect_social_updates(
+    config: SocialConfig, cursors: Dict[str, str] | None = None
+) -> Tuple[List[SocialPost], Dict[str, str]]:
+    """
+    Run every Twitter/LinkedIn query concurrently in a bounded thread pool.
+    ``cursors`` maps :func:`cursor_key` to the last seen tweet id / post timestamp;
+    only posts newer than that are fetched. Returns the deduplicated posts
+    (newest first) and the advanced cursors; ``post.cursor_keys`` tells which
+    cursors must stay put if that post could not be stored.
+    """
+    cursors = dict(cursors or {})
+    jobs: List[Tuple[str, str]] = [("social_twitter", q) for q in config.twitter_queries]
+    jobs += [("social_linkedin", q) for q in config.linkedin_queries]
+    if not jobs:
+        return [], cursors
+
+    def _run(job: Tuple[str, str]) -> List[SocialPost]:
+        platform, query = job
+        current = cursors.get(cursor_key(platform, query))
+        if platform == "social_twitter":
+            return fetch_twitter_posts(query, config.limit_per_query, since_id=current)
+        return fetch_linkedin_posts(
+            query, config.limit_per_query, region=config.linkedin_region, since=_parse_ts(current)
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(config.max_workers, len(jobs)))) as pool:
+        batches = list(pool.map(_run, jobs))
 
-    for query in config.linkedin_queries:
-        for post in fetch_linkedin_posts(query, config.limit_per_query, region=config.linkedin_region):
-            key = post.id or post.url
-            if key and key in seen:
+    posts: List[SocialPost] = []
+    seen: Dict[str, SocialPost] = {}
+    for (platform, query), batch in zip(jobs, batches):
+        key = cursor_key(platform, query)
+        advanced = _advance_cursor(platform, cursors.get(key), batch)
+        if advanced:
+            cursors[key] = advanced
+        for post in batch:
+            dedup = post.id or post.url
+            if dedup and dedup in seen:
+                seen[dedup].cursor_keys.append(key)
                 continue
-            if key:
-                seen.add(key)
+            post.cursor_keys.append(key)
+            if dedup:
+                seen[dedup] = post
             posts.append(post)
 
     posts.sort(key=lambda p: p.created_at or dt.datetime.min.replace(tzinfo=dt.timezone.utc), reverse=True)
+    return posts, cursors
+
+
+def collect_social_posts(config: SocialConfig) -> List[SocialPost]:
+    posts, _ = collect_social_updates(config)
     return posts
@@ -0,0 +1,141 @@
+"""Live feed updates: ingest publishes to Redis pub/sub, the API fans out over SSE.
+
+Each API process keeps a single Redis subscription and distributes notices to
+in-memory subscriber queues, so the number of viewers does not touch Postgres.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .cache import get_redis
+
+CHANNEL = "events:updates"
+QUEUE_SIZE = 256
+
+
+def event_notice(ev, created: bool) -> dict:
+    """Small payload describing a created or re-scored event (works for ORM rows and dicts)."""
+    get = ev.get if isinstance(ev, dict) else (lambda k: getattr(ev, k, None))
+    return {
+        "id": str(get("id")),
+        "headline": get("headline"),
+        "hotness": get("hotness"),
+        "confirmed": get("confirmed"),
+        "event_type": get("event_type"),
+        "impact_side": get("impact_side"),
+        "source_types": list(get("source_types") or []),
+        "created": created,
+    }
+
+
+async def publish(notices: list[dict]) -> None:
+    if not notices:
+        return
+    r = await get_redis()
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for n in notices:
+            pipe.publish(CHANNEL, json.dumps(n, ensure_ascii=False))
+        await pipe.execute()
+    except Exception as e:
+        print(f"[stream][ERR publish] {e}", flush=True)
+
+
+@dataclass(frozen=True)
+class StreamFilter:
+    min_hotness: float = 0.0
+    types: frozenset = frozenset()
+    event_type: Optional[str] = None
+    impact_side: Optional[str] = None
+
+    def matches(self, n: dict) -> bool:
+        if self.min_hotness > 0 and float(n.get("hotness") or 0.0) < self.min_hotness:
+            return False
+        if self.types and not self.types.intersection(n.get("source_types") or []):
+            return False
+        if self.event_type and n.get("event_type") != self.event_type:
+            return False
+        if self.impact_side and n.get("impact_side") != self.impact_side:
+            return False
+        return True
+
+
+@dataclass(eq=False)
+class Subscription:
+    filter: StreamFilter
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=QUEUE_SIZE))
+
+
+class Broadcaster:
+    """One Redis listener per process, fanned out to many SSE subscribers."""
+
+    def __init__(self) -> None:
+        self._subs: set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, flt: StreamFilter) -> Optional[Subscription]:
+        if await get_redis() is None:
+            return None
+        sub = Subscription(flt)
+        self._subs.add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+
+    def _dispatch(self, notice: dict) -> None:
+        for sub in list(self._subs):
+            if not sub.filter.matches(notice):
+                continue
+            try:
+                sub.queue.put_nowait(notice)
+            except asyncio.QueueFull:
+                pass  # медленный клиент — пропускает уведомление, а не тормозит остальных
+
+    async def _listen(self) -> None:
+        while self._subs:
+            pubsub = None
+            try:
+                r = await get_redis()
+                pubsub = r.pubsub()
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._dispatch(json.loads(message["data"]))
+                    except Exception:
+                        continue
+                    if not self._subs:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[stream][ERR listen] {e}; reconnecting", flush=True)
+                await asyncio.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.unsubscribe(CHANNEL)
+                        await pubsub.reset()
+                    except Exception:
+                        pass
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,140 @@
+"""Ticker / issuer resolver over a local symbol master (``configs/symbols.csv``).
+
+The CSV (``symbol,name,exchange,country,aliases`` with ``|``-separated
+aliases) is loaded once into a sorted tuple of symbols with parallel metadata
+tuples, plus a token index of company-name aliases: first alias token → alias
+token tuples, longest first. ``resolve`` tokenizes headline+teaser once and at
+every token tries the longest alias, then an exact symbol (bisect), so only
+known issuers come out, with exchange and country attached.
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+import os
+import re
+from typing import Optional
+
+MAX_TICKERS = 8
+# заглавные аббревиатуры, совпадающие с тикерами только по случайности
+_NOT_TICKERS = {"CEO", "CFO", "SEC", "FOMC", "FRB", "EC", "ECB", "FCA", "ESMA", "EU", "US", "UK", "USD", "IPO", "AI"}
+_TOKEN = re.compile(r"\$?[^\W_]+(?:[.&'\-][^\W_]+)*")
+
+
+def _default_path() -> str:
+    # в контейнере configs/ смонтирован как /app/configs
+    api_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for base in (api_dir, os.path.dirname(api_dir)):
+        p = os.path.join(base, "configs", "symbols.csv")
+        if os.path.exists(p):
+            return p
+    return os.path.join(os.path.dirname(api_dir), "configs", "symbols.csv")
+
+
+def symbols_path() -> str:
+    return os.getenv("SYMBOLS_PATH") or _default_path()
+
+
+def _tokens(text: str) -> list[str]:
+    return [t.casefold() for t in _TOKEN.findall(text or "")]
+
+
+class SymbolMaster:
+    def __init__(self, rows: list[dict]):
+        rows = sorted((r for r in rows if (r.get("symbol") or "").strip()), key=lambda r: r["symbol"].strip().upper())
+        symbols: list[str] = []
+        names, exchanges, countries = [], [], []
+        for r in rows:
+            sym = r["symbol"].strip().upper()
+            if symbols and symbols[-1] == sym:
+                continue
+            symbols.append(sym)
+            names.append((r.get("name") or sym).strip())
+            exchanges.append((r.get("exchange") or "").strip() or None)
+            countries.append((r.get("country") or "").strip().upper() or None)
+        self.symbols = tuple(symbols)
+        self.names = tuple(names)
+        self.exchanges = tuple(exchanges)
+        self.countries = tuple(countries)
+        # алиасы: первый токен → (токены, индекс символа), длинные первыми
+        aliases: dict[str, list[tuple[tuple[str, ...], int]]] = {}
+        for r in rows:
+            i = self.index(r["symbol"])
+            for alias in [r.get("name") or ""] + (r.get("aliases") or "").split("|"):
+                toks = tuple(_tokens(alias))
+                if toks:
+                    aliases.setdefault(toks[0], []).append((toks, i))
+        self._aliases = {k: sorted(set(v), key=lambda a: -len(a[0])) for k, v in aliases.items()}
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def index(self, symbol: str) -> Optional[int]:
+        sym = (symbol or "").strip().upper()
+        i = bisect.bisect_left(self.symbols, sym)
+        return i if i < len(self.symbols) and self.symbols[i] == sym else None
+
+    def entity(self, i: int) -> dict:
+        return {"name": self.names[i], "type": "ORG", "ticker": self.symbols[i],
+                "exchange": self.exchanges[i], "country": self.countries[i], "source": "symbols"}
+
+    def resolve(self, text: str, limit: int = MAX_TICKERS) -> list[dict]:
+        """Known issuers mentioned in ``text`` (by alias or ticker), in order of first mention."""
+        raw = _TOKEN.findall(text or "")
+        folded = [t.casefold() for t in raw]
+        found: list[int] = []
+        pos = 0
+        while pos < len(raw) and len(found) < limit:
+            tok = raw[pos]
+            hit, width = None, 1
+            # имя компании: с заглавной буквы, иначе «магнит»/«shell» ловились бы как эмитенты
+            if tok[0].isupper():
+                for toks, i in self._aliases.get(folded[pos], ()):
+                    if tuple(folded[pos:pos + len(toks)]) == toks:
+                        hit, width = i, len(toks)
+                        break
+            if hit is None:
+                cashtag = tok.startswith("$")
+                sym = tok.lstrip("$")
+                # тикер: $TSLA или заглавное слово; однобуквенные (F, T, C) — только с $
+                if cashtag or (sym.isupper() and len(sym) >= 2 and sym not in _NOT_TICKERS):
+                    hit = self.index(sym)
+            if hit is not None and hit not in found:
+                found.append(hit)
+            pos += width
+        return [self.entity(i) for i in found]
+
+
+def load_symbols(path: str) -> SymbolMaster:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return SymbolMaster(list(csv.DictReader(f)))
+
+
+_master: Optional[SymbolMaster] = None
+_master_stamp: Optional[tuple] = None
+
+
+def get_symbols() -> Optional[SymbolMaster]:
+    """Process-wide symbol master, re-read when the file changes; None if there is no file."""
+    global _master, _master_stamp
+    path = symbols_path()
+    try:
+        st = os.stat(path)
+        stamp = (path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+    if _master is None or stamp != _master_stamp:
+        try:
+            _master = load_symbols(path)
+        except (OSError, csv.Error, KeyError) as e:
+            print(f"[tickers][ERR] {path}: {e}", flush=True)
+            return None
+        _master_stamp = stamp
+        print(f"[tickers] loaded {len(_master)} symbols from {path}", flush=True)
+    return _master if len(_master) else None
+
+
+def resolve_tickers(text: str, limit: int = MAX_TICKERS) -> Optional[list[dict]]:
+    """Issuers found via the symbol master, or None when there is no master (caller falls back)."""
+    master = get_symbols()
+    return None if master is None else master.resolve(text, limit)
@@ -0,0 +1,77 @@
+"""Event timeline stored as rows of ``event_timeline``.
+
+Appends are single-row inserts deduplicated by a unique (event_id, md5(what))
+index, and readers fetch only the newest ``TIMELINE_API_LIMIT`` entries per
+event, so a story with hundreds of updates costs the same as a fresh one.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import os
+import uuid
+from typing import Iterable, Optional
+
+from sqlalchemy import cast, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Event, TimelineEntry
+
+TIMELINE_API_LIMIT = int(os.getenv("TIMELINE_API_LIMIT", "20"))
+
+
+def what_hash(what: str) -> str:
+    # совпадает с md5(text) в Postgres — перенос старых записей в migrations даёт те же ключи
+    return hashlib.md5(what.encode("utf-8")).hexdigest()
+
+
+def entry_row(event_id: uuid.UUID, t: dt.datetime, what: str) -> dict:
+    return {"event_id": event_id, "t": t, "what": what, "what_hash": what_hash(what)}
+
+
+async def add_entry(session: AsyncSession, event_id: uuid.UUID, t: dt.datetime, what: str) -> bool:
+    """Insert one entry; False when the same description is already on the event's timeline."""
+    stmt = (pg_insert(TimelineEntry).values(**entry_row(event_id, t, what))
+            .on_conflict_do_nothing(index_elements=[TimelineEntry.event_id, TimelineEntry.what_hash])
+            .returning(TimelineEntry.id))
+    return (await session.execute(stmt)).scalar_one_or_none() is not None
+
+
+async def last_entry_time(session: AsyncSession, event_id: uuid.UUID) -> Optional[dt.datetime]:
+    return (await session.execute(
+        select(TimelineEntry.t).where(TimelineEntry.event_id == event_id)
+        .order_by(TimelineEntry.t.desc()).limit(1)
+    )).scalar_one_or_none()
+
+
+async def recent_timelines(session: AsyncSession, ids: list[uuid.UUID],
+                           limit: Optional[int] = TIMELINE_API_LIMIT) -> dict[uuid.UUID, list[dict]]:
+    """Newest ``limit`` entries per event (None — all of them), oldest first; one LATERAL probe per id."""
+    if not ids:
+        return {}
+    ids_t = func.unnest(cast(ids, ARRAY(UUID(as_uuid=True)))).table_valued("event_id").render_derived(name="ids")
+    recent = (select(TimelineEntry.id, TimelineEntry.t, TimelineEntry.what)
+              .where(TimelineEntry.event_id == ids_t.c.event_id)
+              .order_by(TimelineEntry.t.desc(), TimelineEntry.id.desc())
+              .limit(limit)
+              .lateral("recent"))
+    # порядок строк LATERAL наружу не переносится — сортируем внешний запрос явно
+    rows = (await session.execute(
+        select(ids_t.c.event_id, recent.c.t, recent.c.what)
+        .select_from(ids_t.join(recent, true()))
+        .order_by(ids_t.c.event_id, recent.c.t, recent.c.id)
+    )).all()
+    out: dict[uuid.UUID, list[dict]] = {}
+    for event_id, t, what in rows:
+        out.setdefault(event_id, []).append({"t": t, "what": what})
+    return out
+
+
+async def attach_timelines(session: AsyncSession, events: Iterable[Event],
+                           limit: Optional[int] = TIMELINE_API_LIMIT) -> None:
+    """Fill ``recent_timeline`` on loaded events (read by the ``timeline`` field builder)."""
+    events = list(events)
+    by_id = await recent_timelines(session, [e.id for e in events], limit)
+    for e in events:
+        e.recent_timeline = by_id.get(e.id, [])
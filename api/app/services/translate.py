@@ -1,14 +1,23 @@
 # api/app/services/translate.py
-import os, hashlib, json
+import os, hashlib, json, re, asyncio
 from typing import Optional
-import redis.asyncio as aioredis
 from fastapi.encoders import jsonable_encoder
 
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..db import SessionLocal
+from ..models import Translation
+from .cache import get_redis
+
 _client = None
-_redis = None
+
+TRANSLATE_BATCH_SIZE = int(os.getenv("TRANSLATE_BATCH_SIZE", "40"))
+# Redis — горячий слой; долговременно переводы живут в таблице translations
+TRANSLATE_CACHE_TTL = int(os.getenv("TRANSLATE_CACHE_TTL", "86400"))
 
 async def _get_client():
-    """Возвращает OpenAI-совместимый клиент или None (если ключа/пакета нет)."""
+    """Возвращает async OpenAI-совместимый клиент или None (если ключа/пакета нет)."""
     global _client
     if _client is not None:
         return _client
@@ -16,75 +25,171 @@ async def _get_client():
     if not api_key:
         return None
     try:
-        from openai import OpenAI
+        from openai import AsyncOpenAI
     except Exception:
         return None
     base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
     headers = {"HTTP-Referer": "http://localhost:5173", "X-Title": "Fin News Hot"} if "openrouter.ai" in base_url else None
-    _client = OpenAI(api_key=api_key, base_url=base_url, default_headers=headers)
+    _client = AsyncOpenAI(api_key=api_key, base_url=base_url, default_headers=headers)
     return _client
 
-async def _get_redis():
-    global _redis
-    if _redis is not None:
-        return _redis
-    url = os.getenv("REDIS_URL")
-    if not url:
-        return None
-    _redis = aioredis.from_url(url, decode_responses=True)
-    return _redis
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL_TRANSLATE", os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini"))
 
-async def translate_text(text: Optional[str], target: str = "ru") -> str:
-    """Мягкий перевод: без ключа/ошибки просто возвращает исходный текст."""
-    text = (text or "").strip()
-    if not text:
-        return text
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
 
-    h = hashlib.sha1(f"{target}:{text}".encode()).hexdigest()
-    key = f"tr:{h}"
-    r = await _get_redis()
-    if r:
-        cached = await r.get(key)
-        if cached:
-            return cached
+def _cache_key(text: str, target: str, model: str) -> str:
+    return "tr:" + hashlib.sha1(f"{model}:{target}:{text}".encode()).hexdigest()
 
-    client = await _get_client()
-    if client is None:
-        return text  # нет ключа/пакета — не падаем
+async def _load_stored(texts: list[str], target: str, model: str) -> dict[str, str]:
+    """Переводы из таблицы translations (по хэшу текста)."""
+    by_hash = {_text_hash(t): t for t in texts}
+    try:
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(Translation.text_hash, Translation.translated).where(
+                    Translation.target == target,
+                    Translation.model == model,
+                    Translation.text_hash.in_(list(by_hash)),
+                )
+            )).all()
+    except Exception:
+        return {}
+    return {by_hash[h]: out for h, out in rows if h in by_hash}
+
+async def _store(fresh: dict[str, str], target: str, model: str) -> None:
+    rows = [
+        {"text_hash": _text_hash(t), "target": target, "model": model, "source_text": t, "translated": out}
+        for t, out in fresh.items() if out != t  # неудачный перевод (исходник) не закрепляем
+    ]
+    if not rows:
+        return
+    try:
+        async with SessionLocal() as db:
+            async with db.begin():
+                await db.execute(pg_insert(Translation).values(rows).on_conflict_do_nothing())
+    except Exception as e:
+        print(f"[translate][ERR store] {e}", flush=True)
+
+async def _cache_put(r, items: dict[str, str], target: str, model: str) -> None:
+    if not r or not items:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for t, out in items.items():
+            pipe.setex(_cache_key(t, target, model), TRANSLATE_CACHE_TTL, out)
+        await pipe.execute()
+    except Exception:
+        pass
 
-    model = os.getenv("OPENAI_MODEL_TRANSLATE", os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini"))
+async def _llm_one(client, text: str, target: str) -> str:
     prompt = f"Переведи на {target} кратко и естественно. Не добавляй ничего и не теряй цифры/имена:\n{text}"
     try:
-        resp = client.chat.completions.create(
-            model=model,
+        resp = await client.chat.completions.create(
+            model=_model(),
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+        )
+        return (resp.choices[0].message.content or "").strip() or text
+    except Exception:
+        return text
+
+async def _llm_batch(client, texts: list[str], target: str) -> list[str]:
+    """Один запрос на пачку строк: нумерованный список → JSON-массив той же длины."""
+    if len(texts) == 1:
+        return [await _llm_one(client, texts[0], target)]
+    numbered = "\n".join(f"{i}. {json.dumps(t, ensure_ascii=False)}" for i, t in enumerate(texts, 1))
+    prompt = (
+        f"Переведи на {target} каждую из {len(texts)} строк кратко и естественно. "
+        "Не добавляй ничего и не теряй цифры/имена. "
+        f"Верни ТОЛЬКО JSON-массив из {len(texts)} строк в том же порядке:\n{numbered}"
+    )
+    try:
+        resp = await client.chat.completions.create(
+            model=_model(),
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
         )
-        out = (resp.choices[0].message.content or "").strip() or text
+        raw = resp.choices[0].message.content or ""
+        m = re.search(r"\[.*\]", raw, re.S)
+        data = json.loads(m.group(0) if m else raw)
+        if isinstance(data, list) and len(data) == len(texts):
+            return [(str(x).strip() if x is not None else "") or t for x, t in zip(data, texts)]
     except Exception:
-        out = text
+        pass
+    # модель сбилась с формата — переводим по одной, но параллельно
+    return list(await asyncio.gather(*(_llm_one(client, t, target) for t in texts)))
 
+async def translate_many(texts: list[Optional[str]], target: str = "ru") -> list[str]:
+    """
+    Пакетный мягкий перевод. Уровни: Redis (один MGET) → таблица translations
+    (один SELECT) → LLM пачками параллельно; новые переводы пишутся в таблицу и
+    одним pipeline в Redis. Без ключа/при ошибке возвращает исходный текст.
+    Порядок результата совпадает с входом.
+    """
+    stripped = [(t or "").strip() for t in texts]
+    unique = list(dict.fromkeys(t for t in stripped if t))
+    if not unique:
+        return stripped
+
+    model = _model()
+    resolved: dict[str, str] = {}
+    r = await get_redis()
     if r:
-        await r.setex(key, 3600, out)
-    return out
+        try:
+            cached = await r.mget([_cache_key(t, target, model) for t in unique])
+            resolved.update({t: c for t, c in zip(unique, cached) if c})
+        except Exception:
+            pass
 
-async def translate_event_dict(d: dict, target: str = "ru") -> dict:
-    """Перевод только текстовых полей. Сначала делаем JSON-safe копию (datetime → str)."""
-    d = jsonable_encoder(d)  # безопасная глубокая копия
+    misses = [t for t in unique if t not in resolved]
+    if misses:
+        stored = await _load_stored(misses, target, model)
+        resolved.update(stored)
+        await _cache_put(r, stored, target, model)
+        misses = [t for t in misses if t not in stored]
 
-    d["headline"] = await translate_text(d.get("headline"), target)
-    if d.get("why_now"):
-        d["why_now"] = await translate_text(d["why_now"], target)
+    client = await _get_client() if misses else None
+    if misses and client is not None:
+        chunks = [misses[i:i + TRANSLATE_BATCH_SIZE] for i in range(0, len(misses), TRANSLATE_BATCH_SIZE)]
+        results = await asyncio.gather(*(_llm_batch(client, chunk, target) for chunk in chunks))
+        fresh = {t: out for chunk, outs in zip(chunks, results) for t, out in zip(chunk, outs)}
+        resolved.update(fresh)
+        # out == t — сбой LLM (фолбэк на исходник): не кэшируем, иначе он переживёт сбой на весь TTL
+        translated = {t: out for t, out in fresh.items() if out and out != t}
+        await _store(translated, target, model)
+        await _cache_put(r, translated, target, model)
 
+    return [resolved.get(t, t) if t else t for t in stripped]
+
+async def translate_text(text: Optional[str], target: str = "ru") -> str:
+    """Мягкий перевод: без ключа/ошибки просто возвращает исходный текст."""
+    return (await translate_many([text], target))[0]
+
+def _text_slots(d: dict) -> list[tuple]:
+    """(контейнер, ключ) для всех переводимых полей события."""
+    slots = [(d, "headline")] if "headline" in d else []
+    if d.get("why_now"):
+        slots.append((d, "why_now"))
     dr = d.get("draft")
     if dr:
-        if dr.get("title"):
-            dr["title"] = await translate_text(dr["title"], target)
-        if dr.get("lede"):
-            dr["lede"] = await translate_text(dr["lede"], target)
+        for k in ("title", "lede", "quote"):
+            if dr.get(k):
+                slots.append((dr, k))
         if dr.get("bullets"):
-            dr["bullets"] = [await translate_text(b, target) for b in dr["bullets"]]
-        if dr.get("quote"):
-            dr["quote"] = await translate_text(dr["quote"], target)
+            slots.extend((dr["bullets"], i) for i in range(len(dr["bullets"])))
+    return slots
+
+async def translate_events(items: list[dict], target: str = "ru") -> list[dict]:
+    """Перевод страницы событий: все строки всех событий — одним вызовом translate_many."""
+    items = [jsonable_encoder(d) for d in items]  # безопасная глубокая копия (datetime → str)
+    slots = [slot for d in items for slot in _text_slots(d)]
+    translated = await translate_many([c[k] for c, k in slots], target)
+    for (container, key), value in zip(slots, translated):
+        container[key] = value
+    return items
 
-    return d
\ No newline at end of file
+async def translate_event_dict(d: dict, target: str = "ru") -> dict:
+    """Перевод только текстовых полей. Сначала делаем JSON-safe копию (datetime → str)."""
+    return (await translate_events([d], target))[0]
@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import datetime as dt
+import sys
+from pathlib import Path
+from typing import Optional
+
+from ..db import SessionLocal
+from ..services.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, ExportFilter, export_stream
+
+
+def _parse_time(value: str) -> dt.datetime:
+    t = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return t if t.tzinfo else t.replace(tzinfo=dt.timezone.utc)
+
+
+async def export(output: Optional[Path], fmt: str, flt: ExportFilter, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Пишем выгрузку чанками в файл (или stdout для ndjson). Возвращает число байт."""
+    written = 0
+    fh = output.open("wb") if output else sys.stdout.buffer
+    try:
+        async with SessionLocal() as db:
+            async for part in export_stream(db, flt, fmt, chunk_size):
+                fh.write(part)
+                written += len(part)
+    finally:
+        if output:
+            fh.close()
+        else:
+            fh.flush()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream events into NDJSON or Parquet for analytics/labelling")
+    parser.add_argument("output", help="Destination file, '-' for stdout (ndjson only)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Default: by file extension, else ndjson")
+    parser.add_argument("--since", type=_parse_time, help="first_seen >= SINCE (ISO 8601)")
+    parser.add_argument("--until", type=_parse_time, help="first_seen < UNTIL (ISO 8601)")
+    parser.add_argument("--min-hotness", type=float, default=0.0)
+    parser.add_argument("--confirmed", choices=("true", "false"))
+    parser.add_argument("--types", default="", help="CSV of source types, e.g. regulator,news")
+    parser.add_argument("--event-type")
+    parser.add_argument("--impact-side")
+    parser.add_argument("--min-materiality-ai", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per fetch / row group")
+    args = parser.parse_args()
+
+    output = None if args.output == "-" else Path(args.output)
+    fmt = args.format or ("parquet" if output and output.suffix == ".parquet" else "ndjson")
+    if fmt == "parquet" and output is None:
+        parser.error("parquet cannot be written to stdout")
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+    flt = ExportFilter(
+        since=args.since, until=args.until, min_hotness=args.min_hotness,
+        confirmed=None if args.confirmed is None else args.confirmed == "true",
+        types=tuple(sorted({t.strip() for t in args.types.split(",") if t.strip()})),
+        event_type=args.event_type, impact_side=args.impact_side,
+        min_materiality_ai=args.min_materiality_ai,
+    )
+    size = asyncio.run(export(output, fmt, flt, args.chunk_size))
+    if output:
+        print(f"[export] {fmt}: {size} bytes -> {output}", file=sys.stderr, flush=True)
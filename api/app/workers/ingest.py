@@ -6,6 +6,7 @@ import sys
 import re
 import os, glob
 from urllib.parse import urlparse, urljoin
+from dataclasses import replace
 from functools import partial
 from ..services.ai_filter import classify_event
 
@@ -13,24 +14,29 @@ import yaml
 import feedparser
 import httpx
 import certifi
-from sqlalchemy import select, func, text
+from sqlalchemy import select, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from rapidfuzz import fuzz
 
-try:
-    # может быть не установлен — тогда используем фолбэк
-    from trafilatura import extract as trafi_extract
-except Exception:
-    trafi_extract = None
-
 try:
     from bs4 import BeautifulSoup  # optional HTML fallback
 except Exception:
     BeautifulSoup = None
 
-from ..db import SessionLocal, engine, Base
-from ..models import Event, Source
+from ..db import SessionLocal
+from ..migrations import ensure_schema as _ensure_schema
+from ..models import Event, Source, FeedRegistry
+from ..services.cache import bump_version, data_version
+from ..services.content import fetch_article, strip_html as _strip_html
+from ..services.entities import merge_entities, merge_flags, sync_event_entities
+from ..services.feed import DEFAULT_VIEWS, refresh_cache
 from ..services.hotness import hotness
+from ..services import leaderboard
+from ..services.stream import event_notice, publish
+from ..services.timeline import add_entry, last_entry_time
+from ..services.keywords import KeywordMatcher
 from ..services.keyphrases import extract_keyphrases, score_phrase_hotness
+from .pretranslate import pretranslate, pretranslate_langs
 
 def _harvest_html_index(html: str, base: str, limit: int = 20) -> list[dict]:
     """
@@ -109,39 +115,106 @@ def _discover_feed_link(html: str, base: str) -> str | None:
     except Exception:
         return None
 
-def fetch_feed(url: str):
-    """Загружаем ленту; если дали homepage — пробуем autodiscovery."""
+FEED_REGISTRY_REVERIFY_HOURS = float(os.getenv("FEED_REGISTRY_REVERIFY_HOURS", "24"))
+
+def _http_get(url: str) -> httpx.Response:
+    with httpx.Client(follow_redirects=True, timeout=20.0, verify=certifi.where(), headers=HEADERS) as c:
+        return c.get(url)
+
+def _from_registry(url: str, known: dict):
+    """Короткий путь: сразу идём на уже известный фид, без homepage/autodiscovery."""
+    try:
+        r = _http_get(known["resolved_url"])
+        fp = feedparser.parse(r.content)
+        if getattr(fp, "entries", []):
+            print(f"[feed] {url} -> registry {known['method']} {known['resolved_url']} -> items={len(fp.entries)}", flush=True)
+            return fp
+    except Exception as e:
+        print(f"[feed][ERR] registry {known['resolved_url']}: {e}", file=sys.stderr, flush=True)
+    print(f"[feed] {url} -> registry miss ({known['method']}), re-resolving", flush=True)
+    return None
+
+def resolve_feed(url: str, known: dict | None = None):
+    """
+    Загружаем ленту; если дали homepage — пробуем autodiscovery, затем HTML-harvest.
+    `known` — свежая запись реестра ({"resolved_url", "method"}): для feed/discovered
+    идём прямо на фид, для harvest пропускаем заведомо пустую autodiscovery.
+    Возвращает (fp, resolution); resolution=None, если это был короткий путь по реестру
+    (перепроверять нечего) или ничего найти не удалось.
+    """
+    if known and known.get("method") in ("feed", "discovered"):
+        fp = _from_registry(url, known)
+        if fp is not None:
+            return fp, None
+        known = None
     try:
-        with httpx.Client(follow_redirects=True, timeout=20.0, verify=certifi.where(), headers=HEADERS) as c:
-            r = c.get(url)
+        r = _http_get(url)
         # 1) попробуем распарсить как фид
         fp = feedparser.parse(r.content)
         if getattr(fp, "entries", []):
             print(f"[feed] {url} -> items={len(fp.entries)}", flush=True)
-            return fp
+            return fp, {"resolved_url": str(r.url), "method": "feed"}
         # 2) если HTML — попробуем найти ссылку на RSS/Atom, иначе HTML-harvest
         ct = r.headers.get("content-type","").lower()
         if "html" in ct or (not ct):
-            found = _discover_feed_link(r.text, str(r.url))
+            skip_discovery = bool(known and known.get("method") == "harvest")
+            found = None if skip_discovery else _discover_feed_link(r.text, str(r.url))
             if found:
-                with httpx.Client(follow_redirects=True, timeout=20.0, verify=certifi.where(), headers=HEADERS) as c:
-                    r2 = c.get(found)
+                r2 = _http_get(found)
                 fp2 = feedparser.parse(r2.content)
                 print(f"[feed] {url} -> discovered {found} -> items={len(getattr(fp2,'entries',[]))}", flush=True)
                 if getattr(fp2, "entries", []):
-                    return fp2
+                    return fp2, {"resolved_url": found, "method": "discovered"}
             # HTML-извлечение (псевдо-фид)
             pseudo_entries = _harvest_html_index(r.text, str(r.url), limit=20)
             if pseudo_entries:
                 print(f"[feed] {url} -> harvested {len(pseudo_entries)} items from HTML", flush=True)
-                return {"entries": pseudo_entries}
+                return feedparser.FeedParserDict(entries=pseudo_entries), {"resolved_url": str(r.url), "method": "harvest"}
         # 3) запасной вариант — пусть feedparser сам попробует по URL
         fp3 = feedparser.parse(url, request_headers=HEADERS)
         print(f"[feed] {url} -> items={len(getattr(fp3,'entries',[]))}", flush=True)
-        return fp3
+        if getattr(fp3, "entries", []):
+            return fp3, {"resolved_url": url, "method": "feed"}
+        return fp3, None
     except Exception as e:
         print(f"[feed][ERR] {url}: {e}", file=sys.stderr, flush=True)
-        return feedparser.parse(b"")
+        return feedparser.parse(b""), None
+
+def fetch_feed(url: str):
+    """Загружаем ленту без реестра (полное разрешение homepage → feed)."""
+    return resolve_feed(url)[0]
+
+# ---------- FEED REGISTRY ----------
+
+def _registry_is_fresh(row: FeedRegistry, now: dt.datetime) -> bool:
+    if not row.verified_at:
+        return False
+    return (now - row.verified_at) < dt.timedelta(hours=FEED_REGISTRY_REVERIFY_HOURS)
+
+async def _load_registry() -> dict[str, FeedRegistry]:
+    async with SessionLocal() as session:
+        rows = (await session.execute(select(FeedRegistry))).scalars().all()
+    return {r.url: r for r in rows}
+
+async def _save_resolution(session, url: str, resolution: dict | None, had_row: bool):
+    """Записываем результат полного разрешения; пустой результат только увеличивает failures."""
+    if resolution is None:
+        if had_row:
+            await session.execute(
+                update(FeedRegistry).where(FeedRegistry.url == url)
+                .values(failures=FeedRegistry.failures + 1)
+            )
+        return
+    stmt = pg_insert(FeedRegistry).values(
+        url=url, resolved_url=resolution["resolved_url"], method=resolution["method"],
+        verified_at=utcnow(), failures=0,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FeedRegistry.url],
+        set_={"resolved_url": stmt.excluded.resolved_url, "method": stmt.excluded.method,
+              "verified_at": stmt.excluded.verified_at, "failures": 0},
+    )
+    await session.execute(stmt)
 
 # ---------- SMALL TEXT UTILITIES ----------
 
@@ -156,19 +229,6 @@ def clean_url(u: str) -> str:
     except Exception:
         return u
 
-def _strip_html(html: str | None) -> str:
-    html = html or ""
-    html = re.sub(r"(?is)<script.*?</script>|<style.*?</style>", " ", html)
-    text = re.sub(r"(?is)<[^>]+>", " ", html)
-    return " ".join(text.split())
-
-def _meta_desc(html: str) -> str:
-    m = re.search(r'(?is)<meta[^>]+name=["\']description["\'][^>]+content=["\']([^"\']+)["\']', html or "")
-    if m:
-        return " ".join(m.group(1).split())
-    m = re.search(r'(?is)<meta[^>]+property=["\']og:description["\'][^>]+content=["\']([^"\']+)["\']', html or "")
-    return " ".join(m.group(1).split()) if m else ""
-
 def _first_sents(text: str, n=2, maxlen=260) -> str:
     sents = re.split(r"(?<=[.!?])\s+", text or "")
     out = []
@@ -190,16 +250,10 @@ def teaser_for(entry: dict, link: str) -> str:
     if len(s) >= 60:
         return _first_sents(s)
 
-    # 2) Подтянуть страницу целиком
-    try:
-        with httpx.Client(follow_redirects=True, timeout=20.0, verify=certifi.where(),
-                          headers={"User-Agent": HEADERS["User-Agent"]}) as c:
-            r = c.get(link)
-            raw = r.text
-            txt = (trafi_extract(r.content) if trafi_extract else "") or _meta_desc(raw) or _strip_html(raw)
-            return _first_sents(txt) if txt else ""
-    except Exception:
-        return ""
+    # 2) Текст страницы из общего хранилища: скачивается и извлекается один раз
+    art = fetch_article(link)
+    txt = art.best if art else ""
+    return _first_sents(txt) if txt else ""
 
 # ---------- SIMPLE FEATURES / SCORING ----------
 
@@ -214,6 +268,7 @@ MATERIALITY_KEYS = {
     "bankruptcy": 1.0, "insolvency": 0.9, "restatement": 0.9, "delisting": 0.9,
     "enforcement": 0.7, "order": 0.6, "settlement": 0.8, "approval": 0.6,
 }
+_MATERIALITY = KeywordMatcher(MATERIALITY_KEYS, mode="substring")
 
 
 KEYPHRASE_IMPORTANCE_THRESHOLD = 0.55
@@ -249,19 +304,7 @@ def _fallback_keywords(text, limit=6, min_len=4):
     return set(picked)
 
 
-def _parse_timeline_ts(raw):
-    if not raw:
-        return None
-    try:
-        return dt.datetime.fromisoformat(raw)
-    except ValueError:
-        try:
-            return dt.datetime.fromisoformat(raw.replace("Z", "+00:00"))
-        except Exception:
-            return None
-
-
-def _append_timeline_if_applicable(ev, existing_keywords, new_keywords, now, teaser, title, stype):
+async def _append_timeline_if_applicable(session, ev, existing_keywords, new_keywords, now, teaser, title, stype):
     if not existing_keywords or not new_keywords:
         return False
     overlap = len(existing_keywords & new_keywords)
@@ -271,14 +314,8 @@ def _append_timeline_if_applicable(ev, existing_keywords, new_keywords, now, tea
     if ratio < TIMELINE_KEYWORD_MATCH_THRESHOLD:
         return False
 
-    last_ts = None
-    for item in reversed(ev.timeline or []):
-        if isinstance(item, dict):
-            last_ts = _parse_timeline_ts(item.get("t"))
-        if last_ts:
-            break
-    if last_ts is None:
-        last_ts = getattr(ev, "first_seen", None)
+    # последняя запись — одна проба по (event_id, t DESC), без чтения всей истории
+    last_ts = await last_entry_time(session, ev.id) or getattr(ev, "first_seen", None)
     if last_ts and (now - last_ts) > dt.timedelta(days=TIMELINE_WINDOW_DAYS):
         return False
 
@@ -288,18 +325,14 @@ def _append_timeline_if_applicable(ev, existing_keywords, new_keywords, now, tea
     label = stype.replace("_", " ") if stype else "update"
     description = f"{label}: {snippet}" if snippet else label
 
-    timeline = list(ev.timeline or [])
-    if any(entry.get("what") == description for entry in timeline if isinstance(entry, dict)):
-        return False
-    timeline.append({"t": now.isoformat(), "what": description})
-    ev.timeline = timeline
-    return True
+    # дубликаты отсекает уникальный индекс (event_id, md5(what))
+    return await add_entry(session, ev.id, now, description)
 
 def score_materiality(text: str) -> float:
     t = (text or "").lower()
     if not t:
         return 0.3
-    s = max((w for k, w in MATERIALITY_KEYS.items() if k in t), default=0.3)
+    s = _MATERIALITY.best(_MATERIALITY.hits(t), 0.3)
     return float(min(1.0, max(0.0, s)))
 
 def domain(u: str) -> str:
@@ -322,6 +355,25 @@ def dedup_key(title: str, link: str) -> str:
     base = lk or title.strip().lower()
     return hashlib.sha1(base.encode()).hexdigest()
 
+async def _recent_headlines(session, limit: int = 200) -> list[str]:
+    return (await session.execute(
+        select(Event.headline).order_by(Event.first_seen.desc()).limit(limit)
+    )).scalars().all()
+
+def _novelty(title: str, prev: list[str]) -> float:
+    sim = max([fuzz.partial_ratio(title, t) / 100.0 for t in prev] or [0.0])
+    return max(0.0, 1.0 - sim)
+
+def _source_signals(srcs: list[tuple[str, str]]) -> tuple[float, float, float, float]:
+    """(confirmation, credibility, velocity, scope) по списку источников (url, type)."""
+    dset = {domain(url) for url, _ in srcs if url}
+    has_reg = any(stype in ("regulator", "exchange") for _, stype in srcs)
+    confirmation = 1.0 if has_reg or len(dset) >= 2 else 0.3
+    credibility = max([TYPE_SCORE.get(stype, 0.7) for _, stype in srcs] or [0.7])
+    velocity = min(1.0, len(dset) / 5.0)  # 5 доменов = максимум
+    scope = min(1.0, len(dset) / 3.0)
+    return confirmation, credibility, velocity, scope
+
 # ---------- MAIN UPSERT ----------
 
 async def upsert_event(session, title: str, link: str, stype: str, entry=None):
@@ -337,13 +389,11 @@ async def upsert_event(session, title: str, link: str, stype: str, entry=None):
             existing_keywords_before = _fallback_keywords(" ".join(filter(None, [ev.headline, getattr(ev, "why_now", "") or ""])))
 
     new_source = False
+    entities_changed = False
+    reclassified = False  # event_type/impact_side дописаны — событие переезжает в другие наборы лидерборда
 
     # Новизна = 1 - максимальная схожесть с последними 200 заголовками
-    prev = (await session.execute(
-        select(Event.headline).order_by(Event.first_seen.desc()).limit(200)
-    )).scalars().all()
-    sim = max([fuzz.partial_ratio(title, t) / 100.0 for t in prev] or [0.0])
-    novelty = max(0.0, 1.0 - sim)
+    novelty = _novelty(title, await _recent_headlines(session))
 
     # Аннотация
     teaser = teaser_for(entry or {}, link)
@@ -377,58 +427,51 @@ async def upsert_event(session, title: str, link: str, stype: str, entry=None):
             headline=title,
             hotness=0.0,
             why_now=teaser or "Обновление от первоисточника/регулятора.",
-            entities=phrases or [],
-            ai_entities=ev_ai_entities,
-            risk_flags=ev_risk_flags,
+            entities=merge_entities([], phrases),
+            ai_entities=merge_entities([], ev_ai_entities),
+            risk_flags=merge_flags([], ev_risk_flags),
             event_type=ev_event_type,
             materiality_ai=ev_materiality_ai,
             impact_side=ev_impact_side,
-            timeline=[{"t": now.isoformat(), "what": "first_seen"}],
+            timeline=[],
             confirmed=(stype in ("regulator", "exchange")),
             dedup_group=dk,
             first_seen=now,
         )
         session.add(ev)
         await session.flush()
+        await add_entry(session, ev.id, now, "first_seen")
         created_event = True
     else:
         # если аннотации ещё нет — дополним
         if not ev.why_now and teaser:
             ev.why_now = teaser
 
+        # dedup + top-K: массивы не растут с каждым новым источником; без изменений — не переписываем JSONB
         if phrases:
-            merged = {}
-            for item in (ev.entities or []):
-                name = (item.get("name") or "").strip()
-                if not name:
-                    continue
-                merged[name.lower()] = item
-            for item in phrases:
-                name = (item.get("name") or "").strip()
-                if not name:
-                    continue
-                key = name.lower()
-                existing = merged.get(key)
-                if existing:
-                    existing_score = float(existing.get("score") or 0.0)
-                    incoming_score = float(item.get("score") or 0.0)
-                    if incoming_score > existing_score:
-                        existing.update(item)
-                else:
-                    merged[key] = item
-            ev.entities = list(merged.values())
+            merged = merge_entities(ev.entities, phrases)
+            if merged != ev.entities:
+                ev.entities = merged
+                entities_changed = True
 
         # дополним AI-поля (мягко)
         if ev_event_type and not ev.event_type:
             ev.event_type = ev_event_type
+            reclassified = True
         if ev_impact_side and not ev.impact_side:
             ev.impact_side = ev_impact_side
+            reclassified = True
         if (not getattr(ev, "materiality_ai", None)) and ev_materiality_ai:
             ev.materiality_ai = ev_materiality_ai
         if ev_ai_entities:
-            ev.ai_entities = (ev.ai_entities or []) + ev_ai_entities
+            merged = merge_entities(ev.ai_entities, ev_ai_entities)
+            if merged != ev.ai_entities:
+                ev.ai_entities = merged
+                entities_changed = True
         if ev_risk_flags:
-            ev.risk_flags = list(set((ev.risk_flags or []) + ev_risk_flags))
+            merged = merge_flags(ev.risk_flags, ev_risk_flags)
+            if merged != ev.risk_flags:
+                ev.risk_flags = merged
 
     # не добавляем одинаковую ссылку второй раз
     exists_q = await session.execute(
@@ -438,46 +481,38 @@ async def upsert_event(session, title: str, link: str, stype: str, entry=None):
         session.add(Source(event_id=ev.id, url=link, type=stype, first_seen=now))
         new_source = True
         if not created_event:
-            _append_timeline_if_applicable(ev, existing_keywords_before, new_keywords, now, teaser, title, stype)
-
-    # собрать все источники события для пересчёта
-    srcs = (await session.execute(select(Source).where(Source.event_id == ev.id))).scalars().all()
-    dset = {domain(s.url) for s in srcs if s.url}
-    has_reg = any(s.type in ("regulator", "exchange") for s in srcs)
-    confirmation = 1.0 if has_reg or len(dset) >= 2 else 0.3
-    credibility = max([TYPE_SCORE.get(s.type, 0.7) for s in srcs] or [0.7])
-    velocity = min(1.0, len(dset) / 5.0)  # 5 доменов = максимум
+            await _append_timeline_if_applicable(session, ev, existing_keywords_before, new_keywords, now, teaser, title, stype)
+            # источник и запись хроники живут в своих таблицах — onupdate их не видит, а ETag карточки — по updated_at
+            ev.updated_at = now
+
+    # собрать все источники события для пересчёта (новый источник ещё не сброшен в БД: autoflush off)
+    srcs = [(s.url, s.type) for s in
+            (await session.execute(select(Source).where(Source.event_id == ev.id))).scalars().all()]
+    if new_source and all(url != link for url, _ in srcs):
+        srcs.append((link, stype))
+    ev.source_types = sorted({t for _, t in srcs if t})
+    confirmation, credibility, velocity, scope = _source_signals(srcs)
     materiality_kw = score_materiality(f"{title} {teaser}")
     materiality_phrase = phrase_hotness
     materiality_combined = max(materiality_kw, float(getattr(ev, "materiality_ai", 0.0) or 0.0), materiality_phrase)
-    scope = min(1.0, len(dset) / 3.0)
 
     ev.confirmed = confirmation >= 0.5
+    prev_hotness = None if created_event else ev.hotness
     ev.hotness = hotness(novelty, credibility, confirmation, velocity, materiality_combined, scope)
+    # любой пересчёт с другим результатом (в т.ч. повторно увиденная запись фида) или смена
+    # event_type/impact_side — для лидерборда и SSE
+    rescored = prev_hotness is None or abs(float(ev.hotness) - float(prev_hotness)) > 1e-9 or reclassified
 
-    return ev, created_event, new_source
-
-async def _ensure_schema():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await conn.execute(text("""
-        DO $$ BEGIN
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='event_type')
-            THEN ALTER TABLE events ADD COLUMN event_type VARCHAR(64); END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='materiality_ai')
-            THEN ALTER TABLE events ADD COLUMN materiality_ai DOUBLE PRECISION; END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='impact_side')
-            THEN ALTER TABLE events ADD COLUMN impact_side VARCHAR(16); END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='risk_flags')
-            THEN ALTER TABLE events ADD COLUMN risk_flags JSONB DEFAULT '[]'::jsonb; END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='events' AND column_name='ai_entities')
-            THEN ALTER TABLE events ADD COLUMN ai_entities JSONB DEFAULT '[]'::jsonb; END IF;
-        END $$;
-        """))
-
-async def _fetch_feed_async(url: str):
+    # инвертированный индекс сущностей (related/ticker-запросы без разбора JSONB)
+    # только когда массивы реально переприсвоены: иначе DELETE + upsert всех строк на каждую повторную запись
+    if created_event or entities_changed:
+        await sync_event_entities(session, ev)
+
+    return ev, created_event, new_source, rescored
+
+async def _fetch_feed_async(url: str, known: dict | None = None):
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, partial(fetch_feed, url))
+    return await loop.run_in_executor(None, partial(resolve_feed, url, known))
 
 def _load_sources(maybe_path: str) -> list[dict]:
     if os.path.isdir(maybe_path):
@@ -496,6 +531,8 @@ def _load_sources(maybe_path: str) -> list[dict]:
 async def run(sources_path: str, concurrency: int = 10, max_per_feed: int = 25):
     await _ensure_schema()
     sources = _load_sources(sources_path)
+    registry = await _load_registry()
+    started = utcnow()
     total = 0
     new_events = 0
     new_sources = 0
@@ -505,9 +542,13 @@ async def run(sources_path: str, concurrency: int = 10, max_per_feed: int = 25):
         nonlocal total, new_events, new_sources
         url = src["url"]
         stype = src.get("type", "news")
+        row = registry.get(url)
+        known = None
+        if row is not None and _registry_is_fresh(row, started):
+            known = {"resolved_url": row.resolved_url, "method": row.method}
         async with sem:
-            # 1) тянем фид/страницу ПАРАЛЛЕЛЬНО
-            fp = await _fetch_feed_async(url)
+            # 1) тянем фид/страницу ПАРАЛЛЕЛЬНО (известные фиды — сразу из реестра)
+            fp, resolution = await _fetch_feed_async(url, known)
             entries = getattr(fp, "entries", [])[:max_per_feed]
 
             # 2) а в БД пишем в ОДНОЙ сессии на источник
@@ -518,6 +559,14 @@ async def run(sources_path: str, concurrency: int = 10, max_per_feed: int = 25):
                     session.sync_session.expire_on_commit = False
                 except Exception:
                     pass
+                if resolution is not None or (row is not None and not entries):
+                    try:
+                        async with session.begin():
+                            await _save_resolution(session, url, resolution, had_row=row is not None)
+                    except Exception as e:
+                        print(f"[registry][ERR] {url}: {e}", file=sys.stderr, flush=True)
+                changed = 0
+                notices = []
                 for it in entries:
                     title = it.get("title") or ""
                     link = clean_url(it.get("link") or "")
@@ -526,8 +575,12 @@ async def run(sources_path: str, concurrency: int = 10, max_per_feed: int = 25):
                     try:
                         # commit/rollback per item to avoid long-running transactions
                         async with session.begin():
-                            _, ce, cs = await upsert_event(session, title, link, stype, entry=it)
+                            ev, ce, cs, rescored = await upsert_event(session, title, link, stype, entry=it)
                         total += 1
+                        if ce or cs or rescored:
+                            changed += 1
+                            # новое событие или hotness изменился: Redis-лидерборд должен совпадать с БД
+                            notices.append(event_notice(ev, created=ce))
                         if ce: new_events += 1
                         if cs: new_sources += 1
                     except asyncio.CancelledError:
@@ -537,9 +590,24 @@ async def run(sources_path: str, concurrency: int = 10, max_per_feed: int = 25):
                     except Exception as e:
                         # fail this item but continue the rest
                         print(f"[db][ERR item] {url}: {e}", file=sys.stderr, flush=True)
+                # лидерборд до новой версии: иначе кэш успеет запомнить старую страницу
+                await leaderboard.record(notices)
+                if changed:
+                    # инвалидация кэша /events и ETag — только если лента действительно изменилась
+                    await bump_version()
+                await publish(notices)
 
     await asyncio.gather(*(_process_src(s) for s in sources))
     print(f"[ingest] done, processed ~{total} items; new_events={new_events}, new_sources={new_sources}", flush=True)
+    langs = pretranslate_langs()
+    if langs:
+        try:
+            await pretranslate(langs, float(os.getenv("PRETRANSLATE_MIN_HOTNESS", "0.5")))
+        except Exception as e:
+            print(f"[pretranslate][ERR] {e}", file=sys.stderr, flush=True)
+    # версию уже подняли источники с изменениями; прогреваем текущую, не инвалидируя кэш ещё раз
+    await refresh_cache(DEFAULT_VIEWS + tuple(replace(v, lang=lang) for lang in langs for v in DEFAULT_VIEWS),
+                        version=await data_version())
 
 # ---------- CLI ----------
 
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+from pathlib import Path
+
+from ..db import SessionLocal, engine
+from ..migrations import ensure_schema
+from ..partitions import archive_partitions
+from ..services import content, leaderboard
+from ..services.cache import bump_version
+from ..services.entities import compact_events, reindex_entities
+
+
+async def reindex(batch_size: int) -> None:
+    async with SessionLocal() as session:
+        done = await reindex_entities(session, batch_size)
+    print(f"[maintenance] reindex-entities: {done} events", flush=True)
+
+
+async def compact(batch_size: int) -> None:
+    async with SessionLocal() as session:
+        scanned, compacted = await compact_events(session, batch_size)
+    if compacted:
+        await bump_version()
+    print(f"[maintenance] compact: {compacted} of {scanned} events rewritten", flush=True)
+
+
+async def archive(older_than_days: float, mode: str, parquet_dir: Path) -> None:
+    async with engine.begin() as conn:
+        names = await archive_partitions(conn, older_than_days, mode, parquet_dir)
+    if names:
+        # в наборах лидерборда могли остаться id архивных событий
+        async with SessionLocal() as session:
+            await leaderboard.rebuild(session)
+        # закэшированные страницы /events ещё содержат архивные события
+        await bump_version()
+    print(f"[maintenance] archive ({mode}, > {older_than_days:g} days): {', '.join(names) or 'nothing to do'}", flush=True)
+
+
+def prune_content_cache() -> None:
+    removed = content.prune()
+    print(f"[maintenance] prune-content: {removed} stale entries removed from {content.CONTENT_CACHE_DIR}", flush=True)
+
+
+async def run(args) -> None:
+    if args.command == "prune-content":
+        # файловый кэш, БД не нужна
+        prune_content_cache()
+        return
+    await ensure_schema()
+    if args.command == "reindex-entities":
+        await reindex(args.batch_size)
+    elif args.command == "compact":
+        await compact(args.batch_size)
+    elif args.command == "archive":
+        await archive(args.older_than_days, args.mode, Path(args.parquet_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-off maintenance jobs over stored events")
+    parser.add_argument("command", choices=["reindex-entities", "compact", "archive", "prune-content"],
+                        help="reindex-entities: rebuild event_entities from entities/ai_entities; "
+                             "compact: dedup and cap entity/flag arrays of existing events; "
+                             "archive: move monthly partitions out of events/sources (EVENTS_PARTITIONING); "
+                             "prune-content: delete article content cache entries older than CONTENT_CACHE_TTL")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--older-than-days", type=float, default=180, help="archive: months fully older than this")
+    parser.add_argument("--mode", choices=["table", "parquet"], default="table",
+                        help="archive: table → schema 'archive'; parquet → file per month, then drop")
+    parser.add_argument("--parquet-dir", default="archive", help="archive --mode parquet: output directory")
+    args = parser.parse_args()
+    asyncio.run(run(args))
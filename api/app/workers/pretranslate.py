@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import os
+from typing import List
+
+from ..db import SessionLocal
+from ..migrations import ensure_schema
+from ..services.feed import EventsQuery, fetch_page
+from ..services.translate import translate_events
+
+DEFAULT_MIN_HOTNESS = 0.5
+DEFAULT_LIMIT = 200
+
+
+def pretranslate_langs() -> List[str]:
+    raw = os.getenv("PRETRANSLATE_LANGS", "")
+    return [x.strip().lower() for x in raw.split(",") if x.strip() and x.strip().lower() != "en"]
+
+
+async def pretranslate(langs: List[str], min_hotness: float = DEFAULT_MIN_HOTNESS, limit: int = DEFAULT_LIMIT) -> int:
+    """Переводим верх ленты заранее, чтобы /events?lang=.. не ждал LLM. Возвращает число событий."""
+    if not langs:
+        return 0
+    async with SessionLocal() as db:
+        items, _ = await fetch_page(db, EventsQuery(min_hotness=min_hotness, limit=limit))
+    for lang in langs:
+        await translate_events(items, lang)
+        print(f"[pretranslate] {lang}: {len(items)} events (hotness >= {min_hotness})", flush=True)
+    return len(items)
+
+
+async def run(langs: List[str], min_hotness: float, limit: int) -> None:
+    await ensure_schema()
+    await pretranslate(langs, min_hotness, limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-translate hot events into configured languages")
+    parser.add_argument("--lang", action="append", default=[], help="Target language (can repeat); default PRETRANSLATE_LANGS")
+    parser.add_argument("--min-hotness", type=float, default=float(os.getenv("PRETRANSLATE_MIN_HOTNESS", DEFAULT_MIN_HOTNESS)))
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Max events to translate")
+    args = parser.parse_args()
+    asyncio.run(run(args.lang or pretranslate_langs(), args.min_hotness, args.limit))
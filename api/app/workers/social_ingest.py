@@ -1,33 +1,173 @@
-﻿import argparse
+import argparse
 import asyncio
 import os
-from typing import Iterable, List
+import sys
+import uuid
+from typing import Dict, Iterable, List
 
-from .ingest import SessionLocal, _ensure_schema, upsert_event  # type: ignore
-from ..services.social_sources import SocialConfig, collect_social_posts
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .ingest import (  # type: ignore
+    SessionLocal,
+    _ensure_schema,
+    _first_sents,
+    _novelty,
+    _recent_headlines,
+    _source_signals,
+    _strip_html,
+    clean_url,
+    dedup_key,
+    score_materiality,
+    utcnow,
+)
+from ..models import Event, EventEntity, SocialCursor, Source, TimelineEntry
+from ..services.ai_filter import classify_event
+from ..services.entities import entity_rows, merge_entities, merge_flags
+from ..services.feed import refresh_cache
+from ..services.hotness import hotness
+from ..services.keyphrases import extract_keyphrases, score_phrase_hotness
+from ..services.social_sources import SocialConfig, collect_social_updates
+from ..services import leaderboard
+from ..services.stream import event_notice, publish
+from ..services.timeline import entry_row
 
 DEFAULT_LIMIT = 10
+STORE_BATCH_SIZE = 50
+# параллельные обогащения пачки: NER и LLM блокирующие и идут в потоках
+ENRICH_CONCURRENCY = int(os.getenv("SOCIAL_ENRICH_CONCURRENCY", "4"))
+
+
+async def _enrich_post(post, title: str, link: str, dk: str, source_type: str, prev: List[str]) -> dict:
+    """Готовим строки Event/Source для нового поста: текст уже есть, страницу не качаем."""
+    teaser = _first_sents(_strip_html(post.text)) or _strip_html(post.text)[:260]
+    context_text = " ".join(filter(None, [title, teaser]))
+    # BERT-NER синхронный: в потоке, чтобы посты пачки обогащались параллельно
+    phrases = await asyncio.to_thread(extract_keyphrases, context_text)
+    cls = await classify_event(title, teaser, [link])
+    materiality_ai = float(cls.get("materiality_ai") or 0.0)
 
+    now = utcnow()
+    event_id = uuid.uuid4()
+    confirmation, credibility, velocity, scope = _source_signals([(link, source_type)])
+    materiality = max(score_materiality(context_text), materiality_ai, score_phrase_hotness(phrases))
+    return {
+        "event": {
+            "id": event_id,
+            "headline": title,
+            "hotness": hotness(_novelty(title, prev), credibility, confirmation, velocity, materiality, scope),
+            "why_now": teaser or "Обновление из соцсетей.",
+            "entities": merge_entities([], phrases),
+            "ai_entities": merge_entities([], cls.get("entities")),
+            "risk_flags": merge_flags([], cls.get("risk_flags")),
+            "event_type": cls.get("event_type"),
+            "materiality_ai": materiality_ai,
+            "impact_side": cls.get("impact_side"),
+            "timeline": [],
+            "confirmed": confirmation >= 0.5,
+            "dedup_group": dk,
+            "first_seen": now,
+            "source_types": [source_type],
+        },
+        "source": {"id": uuid.uuid4(), "event_id": event_id, "url": link, "type": source_type, "first_seen": now},
+        "entity_rows": entity_rows(event_id, now, phrases or [], cls.get("entities") or []),
+        "timeline": entry_row(event_id, now, "first_seen"),
+    }
+
+
+async def _insert_rows(session, rows: List[dict]) -> List[dict]:
+    """Set-based insert пачки; при ошибке — построчно, чтобы один плохой пост не ронял остальные."""
+    try:
+        async with session.begin():
+            await session.execute(insert(Event), [r["event"] for r in rows])
+            await session.execute(insert(Source), [r["source"] for r in rows])
+            await session.execute(insert(TimelineEntry), [r["timeline"] for r in rows])
+            entity_batch = [e for r in rows for e in r["entity_rows"]]
+            if entity_batch:
+                await session.execute(insert(EventEntity), entity_batch)
+        return rows
+    except Exception as e:
+        print(f"[social_ingest][ERR batch] {e}; retrying per item", file=sys.stderr, flush=True)
+    stored = []
+    for row in rows:
+        try:
+            async with session.begin():
+                await session.execute(insert(Event), [row["event"]])
+                await session.execute(insert(Source), [row["source"]])
+                await session.execute(insert(TimelineEntry), [row["timeline"]])
+                if row["entity_rows"]:
+                    await session.execute(insert(EventEntity), row["entity_rows"])
+            stored.append(row)
+        except Exception as e:
+            print(f"[social_ingest][ERR item] {row['source']['url']}: {e}", file=sys.stderr, flush=True)
+    return stored
+
+
+async def _store_posts(posts: Iterable, source_type: str) -> tuple[int, list]:
+    """
+    Bulk-путь для соцпостов: дедуп одним запросом по dedup_group (ключ канонического URL
+    поста, в котором зашит id платформы), обогащение пачками и set-based вставка.
+    Уже известные посты пропускаются — их не нужно пересчитывать через upsert_event.
+    Возвращает (сколько записано, посты, которые записать не удалось).
+    """
+    candidates: Dict[str, tuple] = {}
+    for post in posts:
+        link = clean_url(post.url or "")
+        if not link:
+            continue
+        title = post.title or post.text[:120] or "Social update"
+        dk = dedup_key(title, link)
+        candidates.setdefault(dk, (post, title, link))
+    if not candidates:
+        return 0, []
 
-async def _store_posts(posts: Iterable, source_type: str) -> None:
     async with SessionLocal() as session:  # type: ignore
         try:
             session.sync_session.autoflush = False
             session.sync_session.expire_on_commit = False
         except Exception:
             pass
-        for post in posts:
-            title = post.title or post.text[:120] or "Social update"
-            link = post.url
-            if not link:
-                continue
-            entry = {
-                "summary": post.text,
-                "title": title,
-                "published": post.created_at.isoformat() if post.created_at else None,
-            }
-            async with session.begin():
-                await upsert_event(session, title, link, source_type, entry=entry)
+        async with session.begin():
+            known = set((await session.execute(
+                select(Event.dedup_group).where(Event.dedup_group.in_(list(candidates)))
+            )).scalars().all())
+            prev = list(await _recent_headlines(session))
+        fresh = [(dk, *item) for dk, item in candidates.items() if dk not in known]
+
+        sem = asyncio.Semaphore(max(1, ENRICH_CONCURRENCY))
+
+        async def _bounded(*args):
+            async with sem:
+                return await _enrich_post(*args)
+
+        stored = 0
+        failed = []
+        for i in range(0, len(fresh), STORE_BATCH_SIZE):
+            batch = fresh[i:i + STORE_BATCH_SIZE]
+            enriched = await asyncio.gather(
+                *(_bounded(post, title, link, dk, source_type, prev) for dk, post, title, link in batch),
+                return_exceptions=True,
+            )
+            rows, row_posts = [], []
+            for (dk, post, title, link), row in zip(batch, enriched):
+                if isinstance(row, BaseException):
+                    print(f"[social_ingest][ERR enrich] {link}: {row}", file=sys.stderr, flush=True)
+                    failed.append(post)
+                    continue
+                rows.append(row)
+                row_posts.append(post)
+            if rows:
+                inserted = await _insert_rows(session, rows)
+                # не вставленные поштучно — тоже неудача: их курсор не двигаем
+                ok = {id(r) for r in inserted}
+                failed += [post for r, post in zip(rows, row_posts) if id(r) not in ok]
+                stored += len(inserted)
+                notices = [event_notice(r["event"], created=True) for r in inserted]
+                await publish(notices)
+                await leaderboard.record(notices)
+                prev = [r["event"]["headline"] for r in inserted] + prev
+    print(f"[social_ingest] {source_type}: stored {stored} new posts, skipped {len(known)} known", flush=True)
+    return stored, failed
 
 
 def _split_env(name: str) -> List[str]:
@@ -53,16 +193,55 @@ def _env_str(name: str, default: str | None = None) -> str | None:
     return value or default
 
 
+async def _load_cursors() -> Dict[str, str]:
+    async with SessionLocal() as session:  # type: ignore
+        rows = (await session.execute(select(SocialCursor))).scalars().all()
+    return {row.key: row.value for row in rows}
+
+
+async def _save_cursors(previous: Dict[str, str], cursors: Dict[str, str]) -> None:
+    changed = [(k, v) for k, v in cursors.items() if previous.get(k) != v]
+    if not changed:
+        return
+    now = utcnow()
+    rows = []
+    for key, value in changed:
+        platform, _, query = key.partition(":")
+        rows.append({"key": key, "platform": platform, "query": query, "value": value, "updated_at": now})
+    stmt = pg_insert(SocialCursor).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SocialCursor.key],
+        set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+    )
+    async with SessionLocal() as session:  # type: ignore
+        async with session.begin():
+            await session.execute(stmt)
+
+
 async def run(config: SocialConfig) -> None:
     await _ensure_schema()
-    posts = collect_social_posts(config)
+    previous = await _load_cursors()
+    loop = asyncio.get_running_loop()
+    posts, cursors = await loop.run_in_executor(None, collect_social_updates, config, previous)
+    print(f"[social_ingest] fetched {len(posts)} new posts", flush=True)
     twitter_posts = [p for p in posts if p.platform == "social_twitter"]
     linkedin_posts = [p for p in posts if p.platform == "social_linkedin"]
 
-    if twitter_posts:
-        await _store_posts(twitter_posts, "social_twitter")
-    if linkedin_posts:
-        await _store_posts(linkedin_posts, "social_linkedin")
+    stored = 0
+    failed = []
+    for platform_posts, source_type in ((twitter_posts, "social_twitter"), (linkedin_posts, "social_linkedin")):
+        if platform_posts:
+            n, bad = await _store_posts(platform_posts, source_type)
+            stored += n
+            failed += bad
+    if stored:
+        await refresh_cache()
+    # курсоры двигаем только после записи; запросы с незаписанными постами остаются на старом курсоре,
+    # иначе эти посты окажутся ниже отметки и больше не придут
+    held = {key for post in failed for key in post.cursor_keys}
+    if held:
+        print(f"[social_ingest] {len(failed)} posts not stored; cursors kept for {', '.join(sorted(held))}", flush=True)
+    await _save_cursors(previous, {k: v for k, v in cursors.items() if k not in held})
 
 
 if __name__ == "__main__":
@@ -71,6 +250,7 @@ if __name__ == "__main__":
     parser.add_argument("--linkedin-query", action="append", default=[], help="LinkedIn search query (via DuckDuckGo)")
     parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Max posts per query")
     parser.add_argument("--linkedin-region", default=None, help="DuckDuckGo region code, e.g. us-en, ru-ru")
+    parser.add_argument("--max-workers", type=int, default=None, help="Concurrent social queries (thread pool size)")
     args = parser.parse_args()
 
     twitter_queries = args.twitter_query or _split_env("SOCIAL_TWITTER_QUERIES")
@@ -79,6 +259,7 @@ if __name__ == "__main__":
     if args.limit == DEFAULT_LIMIT:
         limit = _env_int("SOCIAL_LIMIT", DEFAULT_LIMIT)
     region = args.linkedin_region or _env_str("SOCIAL_LINKEDIN_REGION")
+    max_workers = args.max_workers or _env_int("SOCIAL_MAX_WORKERS", 4)
 
     if not twitter_queries and not linkedin_queries:
         print("[social_ingest] no twitter/linkedin queries configured; nothing to do", flush=True)
@@ -89,5 +270,6 @@ if __name__ == "__main__":
         linkedin_queries=linkedin_queries,
         limit_per_query=limit,
         linkedin_region=region,
+        max_workers=max_workers,
     )
     asyncio.run(run(config))
@@ -0,0 +1,122 @@
+"""/events filters must be served by their indexes (EXPLAIN on build_events_stmt).
+
+Needs a throwaway Postgres with pg_trgm: set TEST_DATABASE_URL (postgresql+asyncpg://...).
+The schema is created with ensure_schema(), events/event_entities are truncated
+and filled with a skewed sample; the planner is not steered (seq scans stay
+enabled), so each case checks that the index wins on cost.
+"""
+import asyncio
+import os
+
+import orjson
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import migrations
+from app.services.feed import EventsQuery, build_events_stmt
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+ROWS = 200_000
+
+SEED = [
+    "TRUNCATE events CASCADE",
+    # перекос как в живой ленте: редкие типы/источники/тикеры, частые значения — вперемешку с ними;
+    # first_seen растёт вместе с физическим порядком строк (лента пишется по времени)
+    f"""
+    INSERT INTO events (id, headline, hotness, why_now, entities, timeline, confirmed, dedup_group,
+                        first_seen, event_type, materiality_ai, impact_side, risk_flags, ai_entities,
+                        source_types, updated_at)
+    SELECT gen_random_uuid(), 'Acme event ' || g, random(), NULL, '[]', '[]', g % 20 = 0, 'dk' || g,
+           now() - (({ROWS} - g) * interval '10 seconds'),
+           CASE WHEN g % 200 = 0 THEN 'delisting' WHEN g % 10 = 1 THEN 'fine' ELSE 'other' END,
+           CASE WHEN g % 10 = 0 THEN random() END,
+           (ARRAY['pos','neg','uncertain'])[g % 3 + 1], '[]', '[]',
+           CASE WHEN g % 1000 = 0 THEN ARRAY['regulator'] ELSE ARRAY['news'] END, now()
+    FROM generate_series(1, {ROWS}) g
+    """,
+    # по имени на событие (500 разных); тикер TSLA — у 0.2% событий
+    """
+    INSERT INTO event_entities (event_id, key, name, weight, first_seen, ticker, type)
+    SELECT id, 'n:acme ' || (abs(hashtext(id::text)) % 500), 'Acme', 1.0, first_seen, NULL, 'ORG'
+    FROM events
+    """,
+    """
+    INSERT INTO event_entities (event_id, key, name, weight, first_seen, ticker, type)
+    SELECT id, 't:TSLA', 'TSLA', 1.0, first_seen, 'TSLA', 'TICKER'
+    FROM events WHERE abs(hashtext(id::text)) % 500 = 0
+    """,
+    "ANALYZE events",
+    "ANALYZE event_entities",
+]
+
+CASES = {
+    "types": (EventsQuery(types=("regulator",)), {"ix_events_source_types"}),
+    "event_type_hotness": (EventsQuery(event_type="delisting"), {"ix_events_event_type_hotness"}),
+    "event_type_recent": (EventsQuery(event_type="delisting", order="recent"), {"ix_events_event_type_first_seen"}),
+    "impact_side": (EventsQuery(impact_side="neg"), {"ix_events_impact_side_hotness"}),
+    "confirmed": (EventsQuery(confirmed=True), {"ix_events_confirmed_hotness"}),
+    "materiality": (EventsQuery(min_materiality_ai=0.5), {"ix_events_materiality_hotness"}),
+    "hotness": (EventsQuery(), {"ix_events_hotness_id"}),
+    "recent": (EventsQuery(order="recent"), {"ix_events_first_seen_id"}),
+    "ticker": (EventsQuery(ticker="TSLA", order="recent"), {"ix_event_entities_ticker_first_seen"}),
+    "entity": (EventsQuery(entity="acme 7", order="recent"), {"ix_event_entities_key_first_seen"}),
+}
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN над готовым SELECT с обычными bind-параметрами (literal_binds не умеет regconfig)."""
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.stmt, **kw)
+
+
+def _index_names(node) -> set[str]:
+    if isinstance(node, dict):
+        out = {node["Index Name"]} if "Index Name" in node else set()
+        for value in node.values():
+            out |= _index_names(value)
+        return out
+    if isinstance(node, list):
+        return set().union(*(_index_names(v) for v in node)) if node else set()
+    return set()
+
+
+async def _plans() -> dict[str, set[str]]:
+    engine = create_async_engine(TEST_DATABASE_URL)
+    saved, migrations.engine = migrations.engine, engine
+    try:
+        await migrations.ensure_schema()
+        async with engine.begin() as conn:
+            for stmt in SEED:
+                await conn.execute(text(stmt))
+        out = {}
+        async with engine.connect() as conn:
+            for name, (query, _) in CASES.items():
+                plan = (await conn.execute(_Explain(build_events_stmt(query)))).scalar_one()
+                out[name] = _index_names(orjson.loads(plan) if isinstance(plan, (str, bytes)) else plan)
+        return out
+    finally:
+        migrations.engine = saved
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def plans() -> dict[str, set[str]]:
+    return asyncio.run(_plans())
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_filter_uses_index(plans, case):
+    expected = CASES[case][1]
+    assert expected <= plans[case], f"{case}: plan uses {sorted(plans[case])}"
@@ -0,0 +1,50 @@
+"""Keyword heuristics: what changed with KeywordMatcher is pinned here, the rest must stay as it was."""
+import pytest
+
+from app.services.ai_filter import _EVENT_WORDS, _heur_event_type, _heur_impact, _heur_materiality
+from app.services.generate import _key_sents
+from app.services.keywords import KeywordMatcher
+
+
+def _materiality(text: str) -> float:
+    return _heur_materiality(text, _EVENT_WORDS.hits(text))
+
+
+@pytest.mark.parametrize("text, expected", [
+    # новое: до KeywordMatcher первые две ступени не срабатывали никогда
+    ("Acme agrees merger with Foo", 0.85),
+    ("Acme announces buyback", 0.75),
+    ("EU extends sanction on Foo", 0.75),
+    # как раньше: подстрока, в том числе внутри слова
+    ("SEC opens investigations into Acme", 0.7),
+    ("Acme cuts forecasts", 0.6),
+    ("Acme opens new office", 0.4),
+])
+def test_heur_materiality(text, expected):
+    assert _materiality(text) == expected
+
+
+def test_heur_event_type_and_impact_unchanged():
+    assert _heur_event_type(_EVENT_WORDS.hits("SEC fine for Acme after probe")) == "investigation"
+    assert _heur_event_type(_EVENT_WORDS.hits("Refined outlook")) == "guidance"
+    assert _heur_impact("Analyst upgrade despite fine") == "pos"
+    assert _heur_impact("Acme misses estimates") == "neg"
+    assert _heur_impact("Acme opens new office") == "uncertain"
+
+
+def test_key_sents_stems_and_words():
+    # предложения короче 40 символов _sentences отбрасывает
+    ctx = ("Acme posted the finest quarter in its history so far. "
+           "Acme paid penalties to the regulator after the audit.")
+    # новое: основа «penalt» ловит penalties; «fine» по-прежнему только целым словом (не finest)
+    assert _key_sents(ctx)[0] == "Acme paid penalties to the regulator after the audit."
+    ctx = "The weather in the city was nice all week long. The court issued an order against Acme Corp."
+    assert _key_sents(ctx)[0] == "The court issued an order against Acme Corp."
+
+
+def test_matcher_modes():
+    table = [("fine", 1), ("penalt", 2)]
+    assert KeywordMatcher(table, mode="substring").hits("Refined penalty") == {"fine", "penalt"}
+    assert KeywordMatcher(table, mode="word").hits("Refined penalty") == set()
+    assert KeywordMatcher(table, mode="prefix").hits("Fines and penalty") == {"fine", "penalt"}
+    assert KeywordMatcher(table, mode="prefix").hits_many(["fine", "", "penalties"]) == [{"fine"}, set(), {"penalt"}]
@@ -0,0 +1,114 @@
+"""event_dict()/dumps() must produce exactly EventOut.model_dump(mode="json")."""
+import datetime as dt
+import uuid
+
+import orjson
+import pytest
+
+from app.models import Event, Source
+from app.schemas import DraftOut, EntityOut, EventOut, SourceOut, TimelineItem
+from app.services.feed import EVENT_FIELDS, dumps, event_dict
+
+UTC = dt.timezone.utc
+MSK = dt.timezone(dt.timedelta(hours=3))
+
+
+def _event(**overrides) -> Event:
+    e = Event(
+        id=uuid.UUID("7d0f7c8e-2a55-4d3e-9a65-0b1d6f3c1a11"),
+        headline="SEC charges Acme Corp",
+        hotness=0.7125,
+        why_now="Регулятор объявил о штрафе.",
+        entities=[
+            {"name": "Acme Corp", "type": "ORG", "score": 0.93, "extra": "ignored"},
+            {"name": "SEC", "type": "ORG", "ticker": None, "country": "US", "sector": "gov", "source": "ner"},
+        ],
+        draft={"title": "SEC charges Acme", "lede": "Lede.", "bullets": ["a", "b"], "quote": "",
+               "attribution": ["https://www.sec.gov/x"]},
+        confirmed=True,
+        event_type="investigation",
+        materiality_ai=1,
+        impact_side="neg",
+        risk_flags=["single_source"],
+        ai_entities=[
+            {"ticker": "ACME"},
+            {"name": "Apple Inc.", "type": "ORG", "ticker": "AAPL", "exchange": "NASDAQ", "country": "US",
+             "source": "symbols", "unknown": 1},
+        ],
+    )
+    e.sources = [
+        Source(url="https://www.sec.gov/x", type="regulator", first_seen=dt.datetime(2024, 5, 1, 9, 30, tzinfo=UTC)),
+        Source(url="https://example.com/y", type="news",
+               first_seen=dt.datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=MSK)),
+    ]
+    e.recent_timeline = [
+        {"t": dt.datetime(2024, 5, 1, 9, 30, tzinfo=UTC), "what": "first_seen"},
+        {"t": "2024-05-02T08:00:00+03:00", "what": "news: update"},
+    ]
+    for k, v in overrides.items():
+        setattr(e, k, v)
+    return e
+
+
+def _pydantic(e: Event) -> dict:
+    """Reference: the model-based construction the endpoints used before the builders."""
+    return EventOut(
+        id=str(e.id), headline=e.headline, hotness=e.hotness,
+        why_now=e.why_now, confirmed=e.confirmed,
+        entities=[EntityOut(**x) for x in (e.entities or [])],
+        timeline=[TimelineItem(**x) for x in (e.recent_timeline or [])],
+        draft=(DraftOut(**e.draft) if e.draft else None),
+        sources=[SourceOut(url=s.url, type=s.type, first_seen=s.first_seen) for s in (e.sources or [])],
+        event_type=e.event_type,
+        materiality_ai=e.materiality_ai,
+        impact_side=e.impact_side,
+        risk_flags=e.risk_flags or [],
+        ai_entities=[
+            EntityOut(**{**x, "name": x.get("name") or x.get("ticker") or "",
+                         "type": x.get("type") or ("TICKER" if x.get("ticker") else "ORG")})
+            for x in (e.ai_entities or [])
+        ],
+    ).model_dump(mode="json")
+
+
+EVENTS = {
+    "full": _event(),
+    "empty": _event(why_now=None, entities=None, draft=None, risk_flags=None, ai_entities=[],
+                    event_type=None, materiality_ai=None, impact_side=None, recent_timeline=None,
+                    sources=[], confirmed=False),
+}
+
+
+@pytest.mark.parametrize("name", sorted(EVENTS))
+def test_full_row_matches_pydantic(name):
+    e = EVENTS[name]
+    expected = _pydantic(e)
+    got = event_dict(e)
+    assert got == expected
+    assert list(got) == list(expected)  # порядок ключей тоже
+    assert dumps(got).encode() == orjson.dumps(expected)
+
+
+@pytest.mark.parametrize("fields", [
+    ("id", "headline", "hotness"),
+    ("id", "sources"),
+    ("ai_entities", "entities", "draft"),
+    ("timeline", "materiality_ai"),
+])
+def test_projection_matches_pydantic(fields):
+    e = EVENTS["full"]
+    expected = _pydantic(e)
+    got = event_dict(e, fields)
+    assert got == {f: expected[f] for f in fields}
+    assert orjson.loads(dumps([got])) == [{f: expected[f] for f in fields}]
+
+
+def test_field_list_follows_schema():
+    assert tuple(EVENT_FIELDS) == tuple(EventOut.model_fields)
+
+
+def test_datetimes_are_iso_with_z_for_utc():
+    out = event_dict(EVENTS["full"], ("sources", "timeline"))
+    assert out["sources"][0]["first_seen"] == "2024-05-01T09:30:00Z"
+    assert out["sources"][1]["first_seen"] == "2024-05-01T12:00:00.123456+03:00"
+    assert out["timeline"][1]["t"] == "2024-05-02T08:00:00+03:00"
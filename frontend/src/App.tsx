@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { fetchEvents, fetchEvent, generateDraft, type Event } from "./lib/api";
+import { fetchEventsPage, fetchEvent, generateDraft, type Event } from "./lib/api";
 import EventCard from "./components/EventCard";
 
 type ConfirmState = "" | "true" | "false";
@@ -45,6 +45,7 @@ export default function App() {
   const [selId, setSelId] = useState<string | null>(null);
   const [selEvent, setSelEvent] = useState<Event | null>(null);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null); // keyset: X-Next-Cursor последней страницы
   const [auto, setAuto] = useState(true); // автообновление
   const [error, setError] = useState<string | null>(null);
   const [health, setHealth] = useState<Health | null>(null);
@@ -59,19 +60,42 @@ export default function App() {
   });
   const [onlyStarred, setOnlyStarred] = useState(false);
 
-  async function load() {
-    setLoading(true);
-    setError(null);
-    const params = {
+  function params() {
+    return {
       q: q || undefined,
       min_hotness: minHot || undefined,
       confirmed: confirmed === "" ? undefined : confirmed,
       types: types.length ? types.join(",") : undefined,
       limit: 50,
     };
+  }
+
+  async function load() {
+    setLoading(true);
+    setError(null);
+    try {
+      const page = await fetchEventsPage(params());
+      setItems(page.items);
+      setNextCursor(page.nextCursor);
+    } catch (e: any) {
+      setError(e?.message || String(e));
+    } finally {
+      setLoading(false);
+    }
+  }
+
+  // следующая страница — по курсору, а не offset: вставки сверху не сдвигают и не дублируют ленту
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoading(true);
+    setError(null);
     try {
-      const data = await fetchEvents(params);
-      setItems(data);
+      const page = await fetchEventsPage(params(), nextCursor);
+      setItems((prev) => {
+        const seen = new Set(prev.map((x) => x.id));
+        return [...prev, ...page.items.filter((x) => !seen.has(x.id))];
+      });
+      setNextCursor(page.nextCursor);
     } catch (e: any) {
       setError(e?.message || String(e));
     } finally {
@@ -137,9 +161,13 @@ export default function App() {
 
   const generate = async () => {
     if (!selId) return;
-    const updated = await generateDraft(selId);
-    setSelEvent(updated);
-    setItems((prev) => prev.map((x) => (x.id === updated.id ? updated : x)));
+    try {
+      const updated = await generateDraft(selId);
+      setSelEvent(updated);
+      setItems((prev) => prev.map((x) => (x.id === updated.id ? updated : x)));
+    } catch (e: any) {
+      alert(`Черновик не обновлён: ${e?.message || String(e)}`);
+    }
   };
 
   const toolbar = (
@@ -230,6 +258,11 @@ export default function App() {
         ))}
         {!loading && list.length === 0 && <div>Ничего не найдено под фильтры.</div>}
       </div>
+      {!loading && nextCursor && (
+        <button onClick={loadMore} style={{ padding: "8px 12px", borderRadius: 8, marginTop: 12 }}>
+          Показать ещё
+        </button>
+      )}
       {loading && <div>Загружаю…</div>}
       {error && <div style={{ color: "crimson" }}>Ошибка: {error}</div>}
 
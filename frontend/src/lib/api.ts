@@ -6,24 +6,50 @@ export type Event = {
   sources: Source[]; draft?: Draft;
 };
 
-export async function fetchEvents(params: Record<string, string | number | boolean | undefined> = {}) {
+type Params = Record<string, string | number | boolean | undefined>;
+
+function eventsUrl(params: Params) {
   const qs = Object.entries(params).filter(([,v]) => v !== undefined && v !== "")
     .map(([k,v]) => `${encodeURIComponent(k)}=${encodeURIComponent(String(v))}`).join("&");
-  const r = await fetch(`${API_URL}/events${qs ? "?" + qs : ""}`);
+  return `${API_URL}/events${qs ? "?" + qs : ""}`;
+}
+
+export async function fetchEvents(params: Params = {}) {
+  const r = await fetch(eventsUrl(params));
   if (!r.ok) throw new Error(`HTTP ${r.status}`);
   return (await r.json()) as Event[];
 }
 
+// Бесконечная прокрутка: следующую страницу запрашиваем с cursor=nextCursor
+export async function fetchEventsPage(params: Params = {}, cursor?: string) {
+  const r = await fetch(eventsUrl({ ...params, cursor }));
+  if (!r.ok) throw new Error(`HTTP ${r.status}`);
+  return { items: (await r.json()) as Event[], nextCursor: r.headers.get("X-Next-Cursor") };
+}
+
 export async function fetchEvent(id: string, lang?: string) {
   const r = await fetch(`${API_URL}/events/${id}${lang ? `?lang=${lang}` : ""}`);
   if (!r.ok) throw new Error(`HTTP ${r.status}`);
   return (await r.json()) as Event;
 }
 
+export type Job = { job_id: string; event_id: string; status: "queued" | "running" | "done" | "failed"; error?: string | null };
+
+// Генерация идёт в фоне: POST → 202 + job, опрашиваем /jobs/{id}, затем берём событие
 export async function generateDraft(id: string, lang?: string) {
-  const r = await fetch(`${API_URL}/events/${id}/generate${lang ? `?lang=${lang}` : ""}`, { method: "POST" });
+  const r = await fetch(`${API_URL}/events/${id}/generate`, { method: "POST" });
   if (!r.ok) throw new Error(`HTTP ${r.status}`);
-  return (await r.json()) as Event;
+  let job = (await r.json()) as Job;
+  for (let i = 0; i < 120 && (job.status === "queued" || job.status === "running"); i++) {
+    await new Promise((res) => setTimeout(res, 1000));
+    const jr = await fetch(`${API_URL}/jobs/${job.job_id}`);
+    if (!jr.ok) throw new Error(`HTTP ${jr.status}`);
+    job = (await jr.json()) as Job;
+  }
+  if (job.status === "failed") throw new Error(job.error || "generation failed");
+  // за отведённое время задача не закончилась — старый черновик за новый не выдаём
+  if (job.status !== "done") throw new Error(`generation is still ${job.status} (job ${job.job_id})`);
+  return fetchEvent(id, lang);
 }
 
 // + ниже ваших существующих типов/функций
@@ -4,14 +4,14 @@ import json
 import sys
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import AsyncIterator, List
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from fastapi.encoders import jsonable_encoder  # type: ignore
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import selectinload
 
 from api.app.db import SessionLocal  # type: ignore
@@ -40,21 +40,25 @@ class SampleRecord:
         return json.dumps(payload, ensure_ascii=False)
 
 
-async def _load_events(limit: int, min_hotness: float, require_teaser: bool) -> List[Event]:
+async def _iter_events(limit: int, min_hotness: float, require_teaser: bool) -> AsyncIterator[Event]:
+    """Stream events through a server-side cursor instead of loading them all at once."""
     async with SessionLocal() as session:  # type: ignore
         stmt = (
             select(Event)
             .options(selectinload(Event.sources))
             .order_by(Event.first_seen.desc())
             .limit(limit)
+            .execution_options(yield_per=500)
         )
         if min_hotness > 0:
             stmt = stmt.where(Event.hotness >= min_hotness)
-        res = await session.execute(stmt)
-        events = res.scalars().unique().all()
         if require_teaser:
-            events = [e for e in events if (e.why_now or "").strip()]
-        return events
+            stmt = stmt.where(func.coalesce(func.trim(Event.why_now), "") != "")
+        result = await session.stream_scalars(stmt)
+        async for rows in result.partitions():
+            for event in rows:
+                yield event
+            session.expunge_all()
 
 
 def _build_record(event: Event) -> SampleRecord:  # type: ignore
@@ -89,14 +93,17 @@ def _build_record(event: Event) -> SampleRecord:  # type: ignore
     )
 
 
-def _write_dataset(path: Path, records: Iterable[SampleRecord], force: bool) -> None:
+async def _write_dataset(path: Path, events: AsyncIterator[Event], force: bool) -> int:
     if path.exists() and not force:
         raise SystemExit(f"File already exists: {path}. Use --force to overwrite.")
     path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
     with path.open("w", encoding="utf-8") as fh:
-        for record in records:
-            fh.write(record.to_json())
+        async for event in events:
+            fh.write(_build_record(event).to_json())
             fh.write("\n")
+            count += 1
+    return count
 
 
 def parse_args() -> argparse.Namespace:
@@ -126,17 +133,16 @@ def parse_args() -> argparse.Namespace:
 
 async def _main() -> None:
     args = parse_args()
-    events = await _load_events(
+    events = _iter_events(
         limit=args.limit,
         min_hotness=args.min_hotness,
         require_teaser=not args.allow_empty_teaser,
     )
-    if not events:
+    count = await _write_dataset(args.output, events, force=args.force)
+    if not count:
+        args.output.unlink(missing_ok=True)
         raise SystemExit("No events found with the selected filters")
-
-    records = [_build_record(ev) for ev in events]
-    _write_dataset(args.output, records, force=args.force)
-    print(f"Exported {len(records)} records to {args.output}")
+    print(f"Exported {count} records to {args.output}")
 
 
 if __name__ == "__main__":